@@ -7,11 +7,13 @@ to process user queries and generate responses.
 
 import logging
 import os
+import time
 from textwrap import dedent  # Updated to directly import dedent
 from typing import Annotated, Literal, Sequence
 from typing_extensions import TypedDict
 from dotenv import load_dotenv
 
+import openai
 from langchain import hub
 from langchain.tools.retriever import create_retriever_tool
 from langchain_chroma import Chroma
@@ -24,6 +26,11 @@ from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
 from pydantic import BaseModel, Field
 
+from compressor import compress_context, get_encoding
+from index_maintenance import HotSwapRetriever, docstore_directory_for
+from parent_index import get_parent_retriever
+from resilience import CircuitBreaker, ResilientClient, ResilientEmbeddings
+
 ###############################################################################
 # 1. LOGGING SETUP: everything logs to rag_debug.log
 ###############################################################################
@@ -41,27 +48,127 @@ logger.info("Logger initialized. Writing debug info to '%s'", LOG_FILENAME)
 ###############################################################################
 load_dotenv()
 
+# Token budget for the context passed to the generate node
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+# Sentences less similar to the question than this are dropped on compression
+CONTEXT_MIN_SIMILARITY = float(os.getenv("CONTEXT_MIN_SIMILARITY", "0.0"))
+# "chunks" searches the flat index; "parent" searches children, returns parents
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "chunks")
+# Directory of versioned index snapshots; see index_maintenance.py
+SNAPSHOT_ROOT = os.getenv("SNAPSHOT_ROOT", "./snapshots")
+
+# Models: the fallback (cheaper) model answers when the primary is unavailable
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gpt-4.1-nano")
+# Per-node deadlines in seconds, retries included
+NODE_DEADLINES = {
+    "agent": 20.0,
+    "grade_documents": 15.0,
+    "rewrite": 15.0,
+    "generate": 40.0,
+    "embeddings": float(os.getenv("EMBEDDINGS_TIMEOUT", "10")),
+}
+LLM_DEADLINE_SCALE = float(os.getenv("LLM_DEADLINE_SCALE", "1.0"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Send a duplicate request when a call is slower than the observed p95
+LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() == "true"
+
 ###############################################################################
 # 3. SET UP CHROMA + RETRIEVER + TOOLS
 ###############################################################################
-logger.info("Initializing Chroma vectorstore from './chromadb'...")
+logger.info("Initializing Chroma vectorstore...")
+
+# One client (and its circuit breakers) is shared by all nodes and the embeddings
+llm_client = ResilientClient(
+    deadlines={node: d * LLM_DEADLINE_SCALE for node, d in NODE_DEADLINES.items()},
+    max_retries=LLM_MAX_RETRIES,
+    hedge=LLM_HEDGING,
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30.0),
+    fallback_breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30.0),
+    retry_on=(
+        openai.APIConnectionError,  # includes APITimeoutError
+        openai.RateLimitError,
+        openai.InternalServerError,
+    ),
+)
+
+# Embedding calls (retrieval and context compression) share the client's
+# deadline, retries and circuit breaker; they have no fallback model
+embeddings = ResilientEmbeddings(
+    OpenAIEmbeddings(  # requires OPENAI_API_KEY
+        timeout=llm_client.deadline_for("embeddings"),
+        max_retries=0,
+    ),
+    llm_client,
+)
+
+
+def build_retriever(persist_directory: str):
+    """
+    Creates the retriever over the Chroma store in the given directory.
+
+    Args:
+        persist_directory (str): The Chroma directory (working copy or snapshot).
+
+    Returns:
+        BaseRetriever: The flat-chunk or the parent/child retriever.
+    """
+    logger.info("Opening index at '%s' (mode: %s).", persist_directory, RETRIEVAL_MODE)
+    if RETRIEVAL_MODE == "parent":
+        # A snapshot carries its own copy of the parents
+        return get_parent_retriever(
+            embeddings,
+            persist_directory=persist_directory,
+            docstore_directory=docstore_directory_for(persist_directory),
+        )
+    vectorstore = Chroma(
+        persist_directory=persist_directory,
+        collection_name="rag-chroma",
+        embedding_function=embeddings,
+    )
+    return vectorstore.as_retriever()
+
 
-vectorstore = Chroma(
-    persist_directory="./chromadb",
-    collection_name="rag-chroma",
-    embedding_function=OpenAIEmbeddings(),  # requires OPENAI_API_KEY
+# Follows the snapshot published by index_maintenance.py (./chromadb if none)
+retriever = HotSwapRetriever(
+    factory=build_retriever, snapshot_root=SNAPSHOT_ROOT, default_directory="./chromadb"
 )
-retriever = vectorstore.as_retriever()
+retriever.refresh()
 logger.info("Retriever ready.")
 
 retriever_tool = create_retriever_tool(
     retriever,
     name="retrieve_sber2023",
     description="Search and return info about Sber 2023 report",
+    # YouTube chunks' source is a deep link to the moment in the video;
+    # compress_context keeps each document's "Source:" line with its text
+    document_prompt=PromptTemplate.from_template("{page_content}\nSource: {source}"),
 )
 tools = [retriever_tool]
 logger.info("Retriever tool created.")
 
+def chat_models(node: str):
+    """
+    Creates the primary and the fallback chat models for a node.
+
+    The HTTP timeout of each model equals the node's deadline; retries are
+    done by llm_client, so the OpenAI client's own retries are disabled.
+
+    Args:
+        node (str): Name of the graph node.
+
+    Returns:
+        tuple: (primary ChatOpenAI, fallback ChatOpenAI or None)
+    """
+    timeout = llm_client.deadline_for(node)
+    model = ChatOpenAI(model=LLM_MODEL, temperature=0, streaming=False,
+                       timeout=timeout, max_retries=0)
+    fallback = None
+    if LLM_FALLBACK_MODEL:
+        fallback = ChatOpenAI(model=LLM_FALLBACK_MODEL, temperature=0, streaming=False,
+                              timeout=timeout, max_retries=0)
+    return model, fallback
+
 ###############################################################################
 # 4. DEFINE THE AGENT STATE + NODES
 ###############################################################################
@@ -100,8 +207,7 @@ def grade_documents(state) -> Literal["generate", "rewrite"]:
         binary_score: str = Field(description="Either 'yes' or 'no'")
 
     # LLM
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini", streaming=False)
-    llm_with_output = model.with_structured_output(Grade)
+    model, fallback = chat_models("grade_documents")
 
     prompt = PromptTemplate(
         template=dedent("""\
@@ -124,8 +230,11 @@ def grade_documents(state) -> Literal["generate", "rewrite"]:
     question = messages[0].content
     docs = last_message.content
 
-    chain = prompt | llm_with_output
-    graded = chain.invoke({"question": question, "context": docs})
+    chain = prompt | model.with_structured_output(Grade)
+    fallback_chain = prompt | fallback.with_structured_output(Grade) if fallback else None
+    graded = llm_client.invoke(
+        "grade_documents", chain, {"question": question, "context": docs}, fallback_chain
+    )
     score = graded.binary_score.lower().strip()
 
     if score == "yes":
@@ -152,10 +261,11 @@ def agent_node(state):
     messages = state["messages"]
 
     # A ChatOpenAI model that can call the retriever_tool if it decides
-    model = ChatOpenAI(temperature=0, streaming=False, model="gpt-4o-mini")
+    model, fallback = chat_models("agent")
     model = model.bind_tools(tools)
+    fallback = fallback.bind_tools(tools) if fallback else None
 
-    response = model.invoke(messages)
+    response = llm_client.invoke("agent", model, messages, fallback)
     return {"messages": [response]}
 
 
@@ -175,7 +285,7 @@ def rewrite(state):
     original_question = messages[0].content
 
     # We'll just do a simple re-ask with ChatOpenAI
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini", streaming=False)
+    model, fallback = chat_models("rewrite")
     rewrite_prompt = [
         HumanMessage(
             content=dedent(f"""\
@@ -186,7 +296,7 @@ def rewrite(state):
             """)
         )
     ]
-    response = model.invoke(rewrite_prompt)
+    response = llm_client.invoke("rewrite", model, rewrite_prompt, fallback)
     return {"messages": [response]}
 
 
@@ -194,6 +304,8 @@ def rewrite(state):
 def generate(state):
     """
     Generates the final answer using retrieved documents and the user's question.
+    The retrieved documents are compressed to CONTEXT_TOKEN_BUDGET tokens first;
+    if compression fails, the full documents are used.
 
     Args:
         state (dict): The current state of the agent, including messages.
@@ -206,13 +318,33 @@ def generate(state):
     user_question = messages[0].content
     last_message = messages[-1]
     retrieved_docs = last_message.content
+    try:
+        retrieved_docs = compress_context(
+            user_question,
+            retrieved_docs,
+            embeddings,
+            max_tokens=CONTEXT_TOKEN_BUDGET,
+            min_similarity=CONTEXT_MIN_SIMILARITY,
+            encoding=get_encoding(LLM_MODEL),
+        )
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        # Compression is an optimisation: answer from the full context instead
+        logger.warning("generate: context compression failed, using full context: %s", e)
 
     # We'll pull a RAG prompt from somewhere (like a hub), or you can define your own
     prompt_template = hub.pull("rlm/rag-prompt")
-    model = ChatOpenAI(model="gpt-4o-mini", temperature=0, streaming=False)
+    model, fallback = chat_models("generate")
     rag_chain = prompt_template | model | StrOutputParser()
-
-    final_answer = rag_chain.invoke({"context": retrieved_docs, "question": user_question})
+    fallback_chain = prompt_template | fallback | StrOutputParser() if fallback else None
+
+    started = time.perf_counter()
+    final_answer = llm_client.invoke(
+        "generate",
+        rag_chain,
+        {"context": retrieved_docs, "question": user_question},
+        fallback_chain,
+    )
+    logger.info("generate: answer produced in %.2fs", time.perf_counter() - started)
     return {"messages": [final_answer]}
 
 ###############################################################################
@@ -117,6 +117,29 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 ##############################################################################
 # 4. Main Bot Entry
 ##############################################################################
+def build_application(bot_token: str, base_url: str = None):
+    """
+    Builds the Telegram application with the bot's handlers registered.
+
+    Args:
+        bot_token (str): The Telegram bot token.
+        base_url (str, optional): Bot API base URL, e.g. a local fake server
+            for load tests. Defaults to the official Telegram Bot API.
+
+    Returns:
+        Application: The configured application, not yet running.
+    """
+    builder = ApplicationBuilder().token(bot_token)
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
+
+    # Register the /start command
+    application.add_handler(CommandHandler("start", start_command))
+    # Register a text message handler
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    return application
+
 def main():
     """
     Main entry point for the Telegram bot.
@@ -134,13 +157,8 @@ def main():
 
     logger.info("Starting Telegram Bot with token %s", bot_token)
 
-    # Build the Telegram application
-    application = ApplicationBuilder().token(bot_token).build()
-
-    # Register the /start command
-    application.add_handler(CommandHandler("start", start_command))
-    # Register a text message handler
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    # Build the Telegram application (TELEGRAM_API_BASE_URL is for local fakes)
+    application = build_application(bot_token, os.getenv("TELEGRAM_API_BASE_URL"))
 
     logger.info("Bot is polling... Press Ctrl+C to stop.")
     application.run_polling()
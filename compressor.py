@@ -0,0 +1,325 @@
+"""
+This module compresses retrieved context before it is handed to the generation
+step. The retriever returns several large, overlapping chunks; most of their
+sentences are unrelated to the question and the chunk overlap repeats text
+verbatim. Compression removes the duplicates, ranks the remaining sentences by
+embedding similarity to the question and keeps the best ones that fit into a
+token budget, preserving their original order.
+
+Each retrieved document ends with a "Source: ..." line (see document_prompt in
+agent.py); the line is not compressed but kept with its document's sentences.
+"""
+
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import tiktoken
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("rag_logger")
+
+# Sentence boundaries: end punctuation followed by whitespace, or blank lines
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?…])\s+|\n\s*\n")
+WHITESPACE_RE = re.compile(r"\s+")
+# Last line of each document in the retriever tool's output
+SOURCE_PREFIX = "Source: "
+
+
+class WordCountEncoding:  # pylint: disable=too-few-public-methods
+    """
+    A stand-in for a tiktoken encoding that counts whitespace-separated words,
+    or pieces of at most `chars_per_token` characters of each word.
+
+    Used when no tiktoken encoding can be loaded (e.g. no network access).
+    A Russian word is 2-3 tokens, so plain word counts would let the context
+    exceed the token budget several times; counting short pieces errs on the
+    side of a smaller context instead.
+    """
+    def __init__(self, chars_per_token: Optional[int] = None):
+        self.chars_per_token = chars_per_token
+
+    def encode(self, text: str) -> List[str]:
+        """
+        Splits the text on whitespace, and words into pieces if configured.
+        """
+        words = text.split()
+        if not self.chars_per_token:
+            return words
+        step = self.chars_per_token
+        return [word[i:i + step] for word in words for i in range(0, len(word), step)]
+
+
+# Loaded tiktoken encodings by model; failures are not cached, see get_encoding
+_encodings: Dict[str, Any] = {}
+_encoding_retry_at: Dict[str, float] = {}
+ENCODING_RETRY_SECONDS = 300.0
+FALLBACK_CHARS_PER_TOKEN = 3
+
+
+def get_encoding(model: str = "gpt-4o-mini"):
+    """
+    Returns the encoding used to count tokens for the given model.
+
+    tiktoken downloads encoding files on first use, so a loaded encoding is
+    cached per model, and a failed download falls back to cl100k_base and
+    then to a conservative piece counter instead of failing the caller. The
+    fallback is not cached: loading is retried after ENCODING_RETRY_SECONDS.
+
+    Args:
+        model (str): The OpenAI model name.
+
+    Returns:
+        tiktoken.Encoding | WordCountEncoding: The model's encoding, cl100k_base
+        if the model is unknown, or an estimating counter if neither can be loaded.
+    """
+    encoding = _encodings.get(model)
+    if encoding is not None:
+        return encoding
+    if time.monotonic() >= _encoding_retry_at.get(model, 0.0):
+        loaders = (
+            lambda: tiktoken.encoding_for_model(model),
+            lambda: tiktoken.get_encoding("cl100k_base"),
+        )
+        for load in loaders:
+            try:
+                encoding = load()
+            except KeyError:
+                continue
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                logger.warning("get_encoding: cannot load tiktoken encoding: %s", e)
+                continue
+            _encodings[model] = encoding
+            return encoding
+        _encoding_retry_at[model] = time.monotonic() + ENCODING_RETRY_SECONDS
+        logger.warning("get_encoding: estimating tokens for '%s', retrying in %.0fs.",
+                       model, ENCODING_RETRY_SECONDS)
+    return WordCountEncoding(chars_per_token=FALLBACK_CHARS_PER_TOKEN)
+
+
+def clear_encoding_cache():
+    """
+    Forgets loaded encodings and failed loads, so the next call loads again.
+    """
+    _encodings.clear()
+    _encoding_retry_at.clear()
+
+
+def count_tokens(text: str, encoding) -> int:
+    """
+    Counts the number of tokens in the text.
+    """
+    return len(encoding.encode(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Splits text into sentences, dropping empty fragments.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        List[str]: Sentences in their original order.
+    """
+    return [s.strip() for s in SENTENCE_SPLIT_RE.split(text) if s and s.strip()]
+
+
+def split_documents(context: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    Splits the retriever tool's output into documents at their source lines.
+
+    Args:
+        context (str): Documents formatted as "<text>\\nSource: <source>".
+
+    Returns:
+        List[Tuple[str, Optional[str]]]: (text, source) pairs in their original
+        order; text after the last source line has no source.
+    """
+    documents = []
+    lines: List[str] = []
+    for line in context.splitlines():
+        if line.startswith(SOURCE_PREFIX):
+            documents.append(("\n".join(lines), line[len(SOURCE_PREFIX):].strip()))
+            lines = []
+        else:
+            lines.append(line)
+    if any(line.strip() for line in lines):
+        documents.append(("\n".join(lines), None))
+    return documents
+
+
+def _normalize(sentence: str) -> str:
+    return WHITESPACE_RE.sub(" ", sentence).strip().lower()
+
+
+def _contains_words(sentence: str, fragment: str) -> bool:
+    """
+    Returns True if `fragment` occurs in `sentence` on word boundaries.
+    Both are normalized, so words are separated by single spaces.
+    """
+    return re.search(f"(?:^| ){re.escape(fragment)}(?: |$)", sentence) is not None
+
+
+def _unique_indices(sentences: Sequence[str]) -> List[int]:
+    kept: List[int] = []
+    normalized = [_normalize(sentence) for sentence in sentences]
+    for i, norm in enumerate(normalized):
+        if any(_contains_words(normalized[j], norm) for j in kept):
+            continue
+        # A longer version of an earlier fragment: keep the full sentence only
+        kept = [j for j in kept if not _contains_words(norm, normalized[j])]
+        kept.append(i)
+    return kept
+
+
+def deduplicate_sentences(sentences: Sequence[str]) -> List[str]:
+    """
+    Removes sentences repeated by the chunk overlap.
+
+    A sentence is dropped if its normalized text equals, or is contained as
+    whole words in, a sentence that was already kept. Chunks are cut at
+    separators, so the overlap shows up as a fragment of a sentence from the
+    previous chunk that starts and ends on word boundaries.
+    If a later sentence contains an earlier kept fragment, it replaces it.
+
+    Args:
+        sentences (Sequence[str]): Sentences in their original order.
+
+    Returns:
+        List[str]: Unique sentences in their original order.
+    """
+    return [sentences[i] for i in _unique_indices(sentences)]
+
+
+def _cosine_scores(query_vector: Sequence[float], vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    query = np.asarray(query_vector, dtype=float)
+    matrix = np.asarray(vectors, dtype=float)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    norms[norms == 0] = 1.0
+    return matrix @ query / norms
+
+
+def _select_within_budget(  # pylint: disable=too-many-arguments
+    scores: np.ndarray,
+    sentence_tokens: Sequence[int],
+    owners: Sequence[int],
+    source_tokens: Sequence[int],
+    *,
+    max_tokens: int,
+    min_similarity: float,
+) -> set:
+    """
+    Greedily picks the highest-scoring sentences that fit into the budget.
+    The first sentence picked from a document also pays for its source line.
+    """
+    selected = set()
+    opened = set()
+    budget = max_tokens
+    for i in np.argsort(-scores, kind="stable"):
+        if scores[i] < min_similarity:
+            break
+        cost = sentence_tokens[i] + (0 if owners[i] in opened else source_tokens[owners[i]])
+        if cost <= budget:
+            selected.add(int(i))
+            opened.add(owners[i])
+            budget -= cost
+    return selected
+
+
+def _unique_document_sentences(
+    documents: Sequence[Tuple[str, Optional[str]]]
+) -> Tuple[List[str], List[int]]:
+    """
+    Returns the documents' unique sentences and the index of each one's document.
+    Duplicates are removed across documents, since the overlap spans chunks.
+    """
+    sentences, owners = [], []
+    for d, (text, _) in enumerate(documents):
+        for sentence in split_sentences(text):
+            sentences.append(sentence)
+            owners.append(d)
+    unique = _unique_indices(sentences)
+    return [sentences[i] for i in unique], [owners[i] for i in unique]
+
+
+def _join_documents(
+    documents: Sequence[Tuple[str, Optional[str]]], sentences: Sequence[str], owners: Sequence[int]
+) -> str:
+    """
+    Joins the kept sentences back into documents followed by their sources.
+    """
+    parts = []
+    for d, (_, source) in enumerate(documents):
+        text = " ".join(s for s, owner in zip(sentences, owners) if owner == d)
+        if text:
+            parts.append(f"{text}\n{SOURCE_PREFIX}{source}" if source else text)
+    return "\n\n".join(parts)
+
+
+def compress_context(  # pylint: disable=too-many-arguments,too-many-locals
+    question: str,
+    context: str,
+    embeddings: Embeddings,
+    *,
+    max_tokens: int = 1500,
+    min_similarity: float = 0.0,
+    encoding=None,
+) -> str:
+    """
+    Compresses retrieved context for the given question.
+
+    Duplicate sentences are always removed. Sentences whose cosine similarity
+    to the question is below `min_similarity` are dropped (0 disables the
+    threshold). If the result still exceeds `max_tokens`, the most similar
+    sentences that fit into the budget are kept, in their original order.
+    Embeddings are only requested when one of the two steps needs them.
+    Every document with a kept sentence keeps its source line, which counts
+    towards the budget.
+
+    Args:
+        question (str): The user's question.
+        context (str): The retrieved documents' text.
+        embeddings (Embeddings): Embedding model used for similarity scoring.
+        max_tokens (int): Token budget for the compressed context.
+        min_similarity (float): Minimum cosine similarity to keep a sentence.
+        encoding (optional): Encoding for token counting; see get_encoding.
+
+    Returns:
+        str: The compressed context.
+    """
+    started = time.perf_counter()
+    encoding = encoding or get_encoding()
+    tokens_before = count_tokens(context, encoding)
+
+    documents = split_documents(context)
+    sentences, owners = _unique_document_sentences(documents)
+
+    sentence_tokens = [count_tokens(s, encoding) for s in sentences]
+    source_tokens = [
+        count_tokens(f"{SOURCE_PREFIX}{source}", encoding) if source else 0
+        for _, source in documents
+    ]
+    total_tokens = sum(sentence_tokens) + sum(source_tokens[d] for d in set(owners))
+
+    if sentences and (min_similarity > 0 or total_tokens > max_tokens):
+        scores = _cosine_scores(
+            embeddings.embed_query(question), embeddings.embed_documents(sentences)
+        )
+        selected = _select_within_budget(
+            scores, sentence_tokens, owners, source_tokens,
+            max_tokens=max_tokens, min_similarity=min_similarity,
+        )
+        sentences = [s for i, s in enumerate(sentences) if i in selected]
+        owners = [d for i, d in enumerate(owners) if i in selected]
+
+    compressed = _join_documents(documents, sentences, owners)
+    logger.info(
+        "compress_context: %d -> %d tokens in %.3fs",
+        tokens_before,
+        count_tokens(compressed, encoding),
+        time.perf_counter() - started,
+    )
+    return compressed
@@ -0,0 +1,316 @@
+"""
+A local fake of the OpenAI API for tests and load tests. It serves
+chat completions and embeddings with configurable latency and injected
+faults (HTTP errors and hanging responses), so that timeouts, retries,
+hedging, circuit breaking and fallback can be exercised without the network.
+
+When a request offers tools, the fake calls the first (or the forced) tool;
+when it asks for a JSON schema, it answers with matching JSON. Arguments are
+filled from `tool_arguments`, enums, or the last user message, which is
+enough to drive the agent graph through retrieve -> grade -> generate.
+
+Usage:
+    python fake_openai.py [--port 8001] [--latency 0.5] [--error-rate 0.1]
+
+Point a client at it with base_url="http://127.0.0.1:<port>/v1".
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+EMBEDDING_SIZE = 64
+
+
+@dataclass
+class FakeOpenAIConfig:  # pylint: disable=too-many-instance-attributes
+    """
+    Behaviour of the fake server.
+
+    Attributes:
+        latency (float): Median response latency in seconds.
+        latency_sigma (float): Lognormal shape of the latency; 0 means fixed.
+        error_rate (float): Share of requests answered with `error_status`.
+        error_status (int): HTTP status of injected errors.
+        hang_rate (float): Share of requests that hang for `hang_seconds`.
+        hang_seconds (float): How long a hanging request sleeps.
+        reply (str): Content of chat completion answers.
+        tool_arguments (dict): Fixed values of tool/JSON schema arguments.
+        seed (int, optional): Seed for the fault/latency random generator.
+    """
+    latency: float = 0.0
+    latency_sigma: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 500
+    hang_rate: float = 0.0
+    hang_seconds: float = 30.0
+    reply: str = "This is a fake answer."
+    tool_arguments: dict = field(default_factory=lambda: {"binary_score": "yes"})
+    seed: Optional[int] = None
+
+
+def last_user_text(messages: list) -> str:
+    """
+    Returns the text of the last user message of a chat request.
+    """
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content") or ""
+            if isinstance(content, list):
+                return " ".join(part.get("text", "") for part in content)
+            return content
+    return ""
+
+
+def fake_arguments(schema: dict, messages: list, fixed: dict) -> dict:
+    """
+    Builds arguments that satisfy a JSON schema of an object.
+    """
+    arguments = {}
+    for name, prop in (schema.get("properties") or {}).items():
+        if name in fixed:
+            arguments[name] = fixed[name]
+        elif prop.get("enum"):
+            arguments[name] = prop["enum"][0]
+        elif prop.get("type") in ("integer", "number"):
+            arguments[name] = 0
+        elif prop.get("type") == "boolean":
+            arguments[name] = False
+        else:
+            arguments[name] = last_user_text(messages)
+    return arguments
+
+
+def fake_embedding(text: str) -> list:
+    """
+    Returns a deterministic unit-length pseudo-embedding of the text.
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    rng = random.Random(digest)
+    vector = [rng.uniform(-1, 1) for _ in range(EMBEDDING_SIZE)]
+    norm = sum(v * v for v in vector) ** 0.5
+    return [v / norm for v in vector]
+
+
+def send_json(handler: BaseHTTPRequestHandler, status: int, payload: dict):
+    """
+    Writes a JSON response, ignoring clients that already disconnected.
+    """
+    data = json.dumps(payload).encode("utf-8")
+    try:
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+    except (BrokenPipeError, ConnectionResetError):
+        # The client gave up (timeout or hedged request won)
+        pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeOpenAIServer"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Dispatches /v1/chat/completions and /v1/embeddings requests.
+        """
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.server.record_request(self.path)
+
+        delay, fault = self.server.draw()
+        time.sleep(delay)
+        if fault == "hang":
+            time.sleep(self.server.config.hang_seconds)
+        elif fault == "error":
+            self._send(self.server.config.error_status,
+                       {"error": {"message": "Injected fault", "type": "server_error"}})
+            return
+
+        if self.path.endswith("/chat/completions"):
+            self._send(200, self.server.chat_completion(body))
+        elif self.path.endswith("/embeddings"):
+            self._send(200, self.server.embeddings(body))
+        else:
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _send(self, status: int, payload: dict):
+        send_json(self, status, payload)
+
+
+class BackgroundHTTPServer(ThreadingHTTPServer):
+    """
+    A threading HTTP server that serves from a background thread; usable as
+    a context manager.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, handler):
+        super().__init__((host, port), handler)
+        self._thread = None
+
+    def start(self):
+        """
+        Starts serving in a background thread.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the server and closes its socket.
+        """
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class FakeOpenAIServer(BackgroundHTTPServer):
+    """
+    A fake OpenAI-compatible HTTP server running in a background thread.
+
+    Can be used as a context manager:
+
+        with FakeOpenAIServer(FakeOpenAIConfig(error_rate=1.0)) as server:
+            ChatOpenAI(base_url=server.base_url, api_key="test")
+    """
+
+    def __init__(self, config: Optional[FakeOpenAIConfig] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        super().__init__(host, port, _Handler)
+        self.config = config or FakeOpenAIConfig()
+        self.request_counts = {}
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        """
+        The OpenAI base URL of the server, e.g. http://127.0.0.1:8001/v1
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record_request(self, path: str):
+        """
+        Counts a request to the given path.
+        """
+        with self._lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+    def draw(self):
+        """
+        Draws the latency and the fault ('error', 'hang' or None) of a request.
+        """
+        config = self.config
+        with self._lock:
+            delay = config.latency
+            if config.latency_sigma > 0 and config.latency > 0:
+                delay = self._rng.lognormvariate(0, config.latency_sigma) * config.latency
+            roll = self._rng.random()
+        if roll < config.error_rate:
+            return delay, "error"
+        if roll < config.error_rate + config.hang_rate:
+            return delay, "hang"
+        return delay, None
+
+    def chat_completion(self, body: dict) -> dict:
+        """
+        Builds a chat completion response for the request body.
+        """
+        messages = body.get("messages", [])
+        tools = body.get("tools") or []
+        response_format = body.get("response_format") or {}
+        message = {"role": "assistant", "content": self.config.reply}
+        finish_reason = "stop"
+
+        if tools and (not messages or messages[-1].get("role") != "tool"):
+            function = tools[0]["function"]
+            forced = body.get("tool_choice")
+            if isinstance(forced, dict):
+                function = next(t["function"] for t in tools
+                                if t["function"]["name"] == forced["function"]["name"])
+            arguments = fake_arguments(function.get("parameters", {}), messages,
+                                       self.config.tool_arguments)
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call_fake",
+                "type": "function",
+                "function": {"name": function["name"], "arguments": json.dumps(arguments)},
+            }]}
+            finish_reason = "tool_calls"
+        elif response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"].get("schema", {})
+            arguments = fake_arguments(schema, messages, self.config.tool_arguments)
+            message = {"role": "assistant", "content": json.dumps(arguments), "refusal": None}
+
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": finish_reason,
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def embeddings(self, body: dict) -> dict:
+        """
+        Builds an embeddings response for the request body.
+        """
+        texts = body.get("input", [])
+        if isinstance(texts, str):
+            texts = [texts]
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(str(text))}
+                for i, text in enumerate(texts)
+            ],
+            "model": body.get("model", "fake"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI API server.")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Median latency, seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.0, help="Lognormal shape")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=30.0)
+    cli_args = parser.parse_args()
+
+    fake = FakeOpenAIServer(FakeOpenAIConfig(
+        latency=cli_args.latency,
+        latency_sigma=cli_args.latency_sigma,
+        error_rate=cli_args.error_rate,
+        error_status=cli_args.error_status,
+        hang_rate=cli_args.hang_rate,
+        hang_seconds=cli_args.hang_seconds,
+    ), port=cli_args.port)
+    print(f"Fake OpenAI API listening on {fake.base_url}")
+    try:
+        fake.serve_forever()
+    except KeyboardInterrupt:
+        fake.server_close()
@@ -0,0 +1,167 @@
+"""
+A local fake of the Telegram Bot API for load tests. It serves the methods
+the bot uses (getMe, deleteWebhook, getUpdates, sendMessage and
+editMessageText), lets virtual users post messages as updates and records
+the bot's replies, so that end-to-end latency can be measured per chat.
+
+Point the bot at it with ApplicationBuilder().base_url(server.base_url),
+or set TELEGRAM_API_BASE_URL for bot.py.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+from fake_openai import BackgroundHTTPServer, send_json
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "LoadTestBot", "username": "loadtest_bot"}
+
+
+def parse_parameters(content_type: str, raw: bytes) -> dict:
+    """
+    Parses Bot API parameters sent as JSON or as a url-encoded form whose
+    values are JSON-encoded (as python-telegram-bot sends them).
+    """
+    if not raw:
+        return {}
+    if content_type.startswith("application/json"):
+        return json.loads(raw)
+    parameters = {}
+    for key, values in parse_qs(raw.decode("utf-8")).items():
+        try:
+            parameters[key] = json.loads(values[0])
+        except ValueError:
+            parameters[key] = values[0]
+    return parameters
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeTelegramServer"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Dispatches /bot<token>/<method> requests.
+        """
+        length = int(self.headers.get("Content-Length", 0))
+        parameters = parse_parameters(self.headers.get("Content-Type", ""),
+                                      self.rfile.read(length))
+        method = self.path.rstrip("/").rsplit("/", 1)[-1]
+        result = self.server.call(method, parameters)
+        send_json(self, 200, {"ok": True, "result": result})
+
+    do_GET = do_POST
+
+
+class FakeTelegramServer(BackgroundHTTPServer):
+    """
+    A fake Telegram Bot API server running in a background thread.
+
+    Virtual users call `send_user_message(chat_id, text)` and then
+    `wait_for_reply(chat_id, timeout)`; the reply is the next sendMessage
+    or editMessageText the bot makes in that chat.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__(host, port, _Handler)
+        self.method_counts: Dict[str, int] = {}
+        self._updates: List[dict] = []
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._condition = threading.Condition()
+        self._replies: Dict[int, List[dict]] = {}
+
+    @property
+    def base_url(self) -> str:
+        """
+        The Bot API base URL to pass to ApplicationBuilder().base_url(...).
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def send_user_message(self, chat_id: int, text: str) -> int:
+        """
+        Queues a text message from a user as an update; returns its update ID.
+        """
+        with self._condition:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            user = {"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}"}
+            self._updates.append({
+                "update_id": update_id,
+                "message": {
+                    "message_id": self._new_message_id(),
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private", "first_name": user["first_name"]},
+                    "from": user,
+                    "text": text,
+                },
+            })
+            self._condition.notify_all()
+        return update_id
+
+    def wait_for_reply(self, chat_id: int, timeout: float) -> Optional[dict]:
+        """
+        Waits for the bot's next message in the chat; None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._replies.get(chat_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            return self._replies[chat_id].pop(0)
+
+    def call(self, method: str, parameters: dict):
+        """
+        Executes a Bot API method and returns its result.
+        """
+        with self._condition:
+            self.method_counts[method] = self.method_counts.get(method, 0) + 1
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return self._get_updates(parameters)
+        if method in ("sendMessage", "editMessageText"):
+            return self._record_reply(parameters)
+        # deleteWebhook, setMyCommands, sendChatAction, ...
+        return True
+
+    def _new_message_id(self) -> int:
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        return message_id
+
+    def _get_updates(self, parameters: dict) -> List[dict]:
+        offset = int(parameters.get("offset") or 0)
+        limit = int(parameters.get("limit") or 100)
+        deadline = time.monotonic() + float(parameters.get("timeout") or 0)
+        with self._condition:
+            # Updates below the offset are confirmed and can be dropped
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self._updates[:limit]
+
+    def _record_reply(self, parameters: dict) -> dict:
+        chat_id = int(parameters["chat_id"])
+        with self._condition:
+            message = {
+                "message_id": int(parameters.get("message_id") or self._new_message_id()),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": parameters.get("text", ""),
+            }
+            self._replies.setdefault(chat_id, []).append(message)
+            self._condition.notify_all()
+        return message
@@ -0,0 +1,480 @@
+"""
+Maintenance tooling for the Chroma store: health stats, compaction and
+versioned snapshots that the bot can hot-swap without a restart.
+
+ingest.py keeps writing to the working directory (./chromadb). A snapshot is
+a compacted copy of it: every collection is rebuilt from the stored
+embeddings (no re-embedding) with duplicates removed and the given HNSW
+parameters, written to a temporary directory and renamed into place as
+./snapshots/vNNNN. Publishing a snapshot atomically rewrites the
+./snapshots/CURRENT pointer, which the agent checks before each search.
+Publishing an older version rolls back a bad ingest. In parent/child mode the
+parent docstore is copied into the snapshot as vNNNN/docstore, so parents are
+versioned together with the child index.
+
+Usage:
+    python index_maintenance.py stats [PERSIST_DIRECTORY]
+    python index_maintenance.py snapshot [--m 16] [--ef-construction 100]
+                                         [--ef-search 50] [--docstore ./docstore]
+                                         [--publish]
+    python index_maintenance.py publish vNNNN
+    python index_maintenance.py list
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from parent_index import CHILD_COLLECTION_NAME, DOCSTORE_DIRECTORY
+
+import chromadb
+from chromadb.api.client import SharedSystemClient
+from chromadb.config import Settings
+
+SOURCE_DIRECTORY = "./chromadb"
+SNAPSHOT_ROOT = "./snapshots"
+POINTER_FILENAME = "CURRENT"
+# Parent docstore copy inside a snapshot directory
+SNAPSHOT_DOCSTORE = "docstore"
+SNAPSHOT_NAME_RE = re.compile(r"^v(\d{4,})$")
+HNSW_KEYS = ("hnsw:M", "hnsw:construction_ef", "hnsw:search_ef")
+
+
+def open_client(persist_directory: str):
+    """
+    Opens a persistent Chroma client without telemetry.
+    """
+    return chromadb.PersistentClient(
+        path=persist_directory, settings=Settings(anonymized_telemetry=False)
+    )
+
+
+def release_clients():
+    """
+    Closes cached Chroma clients so their directories can be moved or removed.
+    """
+    SharedSystemClient.clear_system_cache()
+
+
+def release_client(persist_directory: str):
+    """
+    Stops the cached Chroma client of one directory, closing its database and
+    index files. Clients of other directories stay open.
+    """
+    # pylint: disable=protected-access
+    path = os.path.abspath(persist_directory)
+    systems = SharedSystemClient._identifier_to_system
+    for identifier, system in list(systems.items()):
+        if system.settings.is_persistent and os.path.abspath(identifier) == path:
+            del systems[identifier]
+            system.stop()
+
+
+###############################################################################
+# 1. Health stats
+###############################################################################
+def directory_size(path: str) -> int:
+    """
+    Returns the total size in bytes of the files under the path.
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def record_key(document: Optional[str], metadata: Optional[dict]) -> str:
+    """
+    Returns the key under which two records count as duplicates: the same
+    text with the same metadata. The parent ID of child chunks is ignored,
+    since re-ingesting a file assigns new parent IDs.
+    """
+    metadata = {k: v for k, v in (metadata or {}).items() if k != "doc_id"}
+    payload = json.dumps([document, metadata], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def iterate_records(collection, batch_size: int = 500, include=("documents", "metadatas")):
+    """
+    Yields batches of records of a collection as returned by `collection.get`.
+    """
+    offset = 0
+    while True:
+        batch = collection.get(include=list(include), limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            return
+        yield batch
+        offset += len(batch["ids"])
+
+
+def index_stats(persist_directory: str) -> Dict[str, dict]:
+    """
+    Reports size, element count and duplicate ratio of every collection.
+
+    Args:
+        persist_directory (str): The Chroma directory.
+
+    Returns:
+        Dict[str, dict]: Stats by collection name, plus the path and
+        total size of the directory under the '_directory' key.
+    """
+    client = open_client(persist_directory)
+    stats = {"_directory": {"path": persist_directory,
+                            "total_bytes": directory_size(persist_directory)}}
+    for name in client.list_collections():
+        collection = client.get_collection(name)
+        keys = set()
+        count = 0
+        for batch in iterate_records(collection):
+            for document, metadata in zip(batch["documents"], batch["metadatas"]):
+                keys.add(record_key(document, metadata))
+                count += 1
+        stats[name] = {
+            "elements": count,
+            "duplicates": count - len(keys),
+            "duplicate_ratio": (count - len(keys)) / count if count else 0.0,
+            "hnsw": {k: v for k, v in (collection.metadata or {}).items() if k in HNSW_KEYS},
+        }
+    return stats
+
+
+def measure_query_latency(
+    persist_directory: str, collection_name: str, queries: List[List[float]], n_results: int = 4
+) -> Dict[str, float]:
+    """
+    Runs the query embeddings against a collection and reports latencies.
+
+    Returns:
+        Dict[str, float]: p50, p95 and mean latency in milliseconds.
+    """
+    collection = open_client(persist_directory).get_collection(collection_name)
+    if queries:
+        # The first query loads the index from disk; don't count it
+        collection.query(query_embeddings=[queries[0]], n_results=n_results)
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        collection.query(query_embeddings=[query], n_results=n_results)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "mean_ms": 0.0}
+    return {
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        "mean_ms": sum(latencies) / len(latencies),
+    }
+
+
+def sample_queries(persist_directory: str, collection_name: str,
+                   count: int = 50, seed: int = 0) -> List[List[float]]:
+    """
+    Samples stored embeddings to use as benchmark queries, so that
+    measuring latency needs no embedding API calls.
+    """
+    collection = open_client(persist_directory).get_collection(collection_name)
+    total = collection.count()
+    rng = random.Random(seed)
+    queries = []
+    for offset in sorted(rng.sample(range(total), min(count, total))):
+        batch = collection.get(include=["embeddings"], limit=1, offset=offset)
+        queries.append(list(batch["embeddings"][0]))
+    return queries
+
+
+###############################################################################
+# 2. Compaction + snapshots
+###############################################################################
+def rebuild_index(
+    source_directory: str,
+    target_directory: str,
+    hnsw: Optional[Dict[str, int]] = None,
+    batch_size: int = 500,
+) -> Dict[str, int]:
+    """
+    Copies every collection into a fresh directory, dropping duplicate
+    records and building the HNSW index with the given parameters.
+
+    Args:
+        source_directory (str): The Chroma directory to compact.
+        target_directory (str): An empty directory for the rebuilt store.
+        hnsw (dict, optional): HNSW collection settings, e.g.
+            {"hnsw:M": 16, "hnsw:construction_ef": 100, "hnsw:search_ef": 50}.
+        batch_size (int): Records copied per batch.
+
+    Returns:
+        Dict[str, int]: Number of records kept by collection name.
+    """
+    source = open_client(source_directory)
+    target = open_client(target_directory)
+    kept = {}
+    for name in source.list_collections():
+        collection = source.get_collection(name)
+        metadata = {k: v for k, v in (collection.metadata or {}).items() if k not in HNSW_KEYS}
+        metadata.update(hnsw or {})
+        rebuilt = target.create_collection(name, metadata=metadata or None,
+                                           embedding_function=None)
+        kept[name] = _copy_unique_records(collection, rebuilt, batch_size)
+    release_clients()
+    return kept
+
+
+def _copy_unique_records(source, target, batch_size: int) -> int:
+    seen = set()
+    include = ("embeddings", "documents", "metadatas")
+    for batch in iterate_records(source, batch_size, include):
+        rows = []
+        for row in zip(batch["ids"], batch["embeddings"], batch["documents"], batch["metadatas"]):
+            key = record_key(row[2], row[3])
+            if key not in seen:
+                seen.add(key)
+                rows.append(row)
+        if rows:
+            ids, embeddings, documents, metadatas = zip(*rows)
+            target.add(ids=list(ids), embeddings=[list(e) for e in embeddings],
+                       documents=list(documents), metadatas=list(metadatas))
+    return len(seen)
+
+
+def list_snapshots(snapshot_root: str = SNAPSHOT_ROOT) -> List[str]:
+    """
+    Returns the snapshot versions in ascending order, e.g. ['v0001', 'v0002'].
+    """
+    if not os.path.isdir(snapshot_root):
+        return []
+    names = [name for name in os.listdir(snapshot_root) if SNAPSHOT_NAME_RE.match(name)]
+    return sorted(names, key=lambda name: int(SNAPSHOT_NAME_RE.match(name).group(1)))
+
+
+def create_snapshot(
+    source_directory: str = SOURCE_DIRECTORY,
+    snapshot_root: str = SNAPSHOT_ROOT,
+    hnsw: Optional[Dict[str, int]] = None,
+    docstore_directory: str = DOCSTORE_DIRECTORY,
+) -> str:
+    """
+    Builds a compacted snapshot of the source directory as the next version.
+    The parent docstore, if it exists, is copied in as well. The snapshot only
+    appears under its final name once it is complete.
+
+    Returns:
+        str: The new version, e.g. 'v0003'.
+
+    Raises:
+        ValueError: If the source has a parent/child index but the docstore
+            is missing, since the snapshot would not be self-contained.
+    """
+    has_docstore = os.path.isdir(docstore_directory)
+    collections = open_client(source_directory).list_collections()
+    if not has_docstore and CHILD_COLLECTION_NAME in collections:
+        raise ValueError(
+            f"{source_directory} has a parent/child index but the docstore "
+            f"{docstore_directory} does not exist; pass the docstore directory."
+        )
+    existing = list_snapshots(snapshot_root)
+    number = int(SNAPSHOT_NAME_RE.match(existing[-1]).group(1)) + 1 if existing else 1
+    version = f"v{number:04d}"
+    tmp_directory = os.path.join(snapshot_root, f".{version}.tmp")
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    rebuild_index(source_directory, tmp_directory, hnsw)
+    if has_docstore:
+        shutil.copytree(docstore_directory, os.path.join(tmp_directory, SNAPSHOT_DOCSTORE))
+    os.rename(tmp_directory, os.path.join(snapshot_root, version))
+    return version
+
+
+def publish_snapshot(version: str, snapshot_root: str = SNAPSHOT_ROOT):
+    """
+    Points CURRENT at the given snapshot. The pointer is replaced atomically,
+    so readers see either the old or the new version.
+    """
+    directory = os.path.join(snapshot_root, version)
+    if not os.path.isdir(directory):
+        raise ValueError(f"Snapshot {version} does not exist in {snapshot_root}")
+    pointer = os.path.join(snapshot_root, POINTER_FILENAME)
+    with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(f"{pointer}.tmp", pointer)
+
+
+def docstore_directory_for(persist_directory: str, default: str = DOCSTORE_DIRECTORY) -> str:
+    """
+    Returns the parent docstore to use with an index directory: the snapshot's
+    own copy if it has one, otherwise `default` (the working docstore).
+    """
+    snapshot_docstore = os.path.join(persist_directory, SNAPSHOT_DOCSTORE)
+    return snapshot_docstore if os.path.isdir(snapshot_docstore) else default
+
+
+def current_index_directory(snapshot_root: str = SNAPSHOT_ROOT,
+                            default: str = SOURCE_DIRECTORY) -> str:
+    """
+    Returns the directory of the published snapshot, or `default` if none is
+    published.
+    """
+    try:
+        with open(os.path.join(snapshot_root, POINTER_FILENAME), encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return default
+    return os.path.join(snapshot_root, version)
+
+
+###############################################################################
+# 3. Hot-swappable retriever
+###############################################################################
+class HotSwapRetriever(BaseRetriever):
+    """
+    A retriever that follows the published snapshot.
+
+    Before each search it reads the CURRENT pointer (a few bytes) and, if
+    another snapshot was published, builds a new underlying retriever for
+    it with `factory(persist_directory)` and releases the previous
+    directory's Chroma client.
+    """
+    factory: Callable[[str], BaseRetriever]
+    snapshot_root: str = SNAPSHOT_ROOT
+    default_directory: str = SOURCE_DIRECTORY
+
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _directory: Optional[str] = PrivateAttr(default=None)
+    _retriever: Optional[BaseRetriever] = PrivateAttr(default=None)
+
+    @property
+    def directory(self) -> Optional[str]:
+        """
+        The directory the current underlying retriever reads from.
+        """
+        return self._directory
+
+    def refresh(self) -> BaseRetriever:
+        """
+        Switches to the published snapshot if it changed and returns the
+        underlying retriever.
+        """
+        # The version itself, not the pointer's mtime: two publishes within
+        # one timestamp tick would leave the mtime unchanged
+        directory = current_index_directory(self.snapshot_root, self.default_directory)
+        with self._lock:
+            if self._retriever is None or directory != self._directory:
+                previous = self._directory
+                self._retriever = self.factory(directory)
+                self._directory = directory
+                if previous is not None:
+                    # Otherwise every swap keeps a snapshot's sqlite and HNSW files open
+                    release_client(previous)
+            return self._retriever
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.refresh().invoke(query, config={"callbacks": run_manager.get_child()})
+
+
+###############################################################################
+# 4. CLI
+###############################################################################
+def print_stats(persist_directory: str):
+    """
+    Prints the health stats of a Chroma directory.
+    """
+    stats = index_stats(persist_directory)
+    directory = stats.pop("_directory")
+    print(f"{directory['path']}: {directory['total_bytes'] / 1024 / 1024:.1f} MiB")
+    for name, item in stats.items():
+        print(f"  {name}: {item['elements']} elements, {item['duplicates']} duplicates "
+              f"({item['duplicate_ratio']:.1%}), HNSW {item['hnsw'] or 'defaults'}")
+
+
+def print_latency(label: str, directories: Dict[str, str], queries: Dict[str, list]):
+    """
+    Prints query latencies of every collection in the given directories.
+    """
+    for name, vectors in queries.items():
+        for directory_label, directory in directories.items():
+            latency = measure_query_latency(directory, name, vectors)
+            print(f"  {label} {name} [{directory_label}]: p50 {latency['p50_ms']:.2f} ms, "
+                  f"p95 {latency['p95_ms']:.2f} ms")
+
+
+def snapshot_command(args):
+    """
+    Compacts the working directory into a new snapshot and compares latency.
+    """
+    hnsw = {
+        "hnsw:M": args.m,
+        "hnsw:construction_ef": args.ef_construction,
+        "hnsw:search_ef": args.ef_search,
+    }
+    print("Before:")
+    print_stats(args.source)
+    client = open_client(args.source)
+    queries = {name: sample_queries(args.source, name, args.queries)
+               for name in client.list_collections()}
+    release_clients()
+
+    version = create_snapshot(args.source, args.snapshot_root, hnsw, args.docstore)
+    directory = os.path.join(args.snapshot_root, version)
+    print(f"Snapshot {version} written to {directory}")
+    print("After:")
+    print_stats(directory)
+    print("Query latency:")
+    print_latency("query", {"before": args.source, "after": directory}, queries)
+
+    if args.publish:
+        publish_snapshot(version, args.snapshot_root)
+        print(f"Published {version}; the bot switches to it on the next search.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chroma index maintenance.")
+    parser.add_argument("--snapshot-root", default=SNAPSHOT_ROOT)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stats_parser = commands.add_parser("stats", help="Report size, elements and duplicates")
+    stats_parser.add_argument("persist_directory", nargs="?", default=SOURCE_DIRECTORY)
+
+    snapshot_parser = commands.add_parser("snapshot", help="Build a compacted snapshot")
+    snapshot_parser.add_argument("--source", default=SOURCE_DIRECTORY)
+    snapshot_parser.add_argument("--m", type=int, default=16, help="HNSW M")
+    snapshot_parser.add_argument("--ef-construction", type=int, default=100)
+    snapshot_parser.add_argument("--ef-search", type=int, default=50)
+    snapshot_parser.add_argument("--docstore", default=DOCSTORE_DIRECTORY,
+                                 help="Parent docstore copied into the snapshot, if it exists")
+    snapshot_parser.add_argument("--queries", type=int, default=50,
+                                 help="Number of sampled queries for the latency check")
+    snapshot_parser.add_argument("--publish", action="store_true",
+                                 help="Make the bot use the new snapshot")
+
+    publish_parser = commands.add_parser("publish", help="Point the bot at a snapshot (rollback)")
+    publish_parser.add_argument("version")
+
+    commands.add_parser("list", help="List snapshots")
+
+    cli_args = parser.parse_args()
+    if cli_args.command == "stats":
+        print_stats(cli_args.persist_directory)
+    elif cli_args.command == "snapshot":
+        snapshot_command(cli_args)
+    elif cli_args.command == "publish":
+        publish_snapshot(cli_args.version, cli_args.snapshot_root)
+        print(f"Published {cli_args.version}.")
+    else:
+        published = current_index_directory(cli_args.snapshot_root, default="")
+        for snapshot in list_snapshots(cli_args.snapshot_root):
+            marker = "*" if published.endswith(snapshot) else " "
+            print(f"{marker} {snapshot}")
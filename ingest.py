@@ -3,10 +3,17 @@ This script ingests data from PDF files or YouTube transcripts, processes it int
 and stores it in a Chroma database for retrieval-augmented generation (RAG) tasks.
 
 Usage:
-    python ingest.py <PDF_FILE_OR_YOUTUBE_URL> [PERSIST_DIRECTORY]
+    python ingest.py <PDF_FILE_OR_YOUTUBE_URL_OR_URL_LIST> [PERSIST_DIRECTORY] [--parent]
+
+YouTube input may be a video, a playlist or a .txt file with one URL per line.
+Transcripts are fetched concurrently and cached in ./transcripts; their chunks
+keep the 'start' time and link to that moment of the video.
+
+With --parent, small child chunks are indexed for search and their parent
+pages/sections are saved to the local docstore (see parent_index.py).
 """
 
-import sys
+import argparse
 from dotenv import load_dotenv
 
 # PDF loader
@@ -20,60 +27,32 @@ from langchain.docstore.document import Document
 from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings
 
-# For YouTube transcripts
-from youtube_transcript_api import YouTubeTranscriptApi
+from parent_index import DOCSTORE_DIRECTORY, get_parent_retriever
+from youtube_loader import (
+    TRANSCRIPT_CACHE_DIRECTORY,
+    DirectoryTranscriptSource,
+    is_youtube_link,
+    load_youtube_documents,
+    read_url_list,
+)
 
 ###############################################################################
-# 1. Helper to detect & parse YouTube
+# 1. Ingest Function
 ###############################################################################
-def is_youtube_link(url: str) -> bool:
-    """
-    Checks if the given URL is a YouTube link.
-
-    Args:
-        url (str): The URL to check.
-
-    Returns:
-        bool: True if the URL is a YouTube link, False otherwise.
-    """
-    return "youtube.com" in url.lower() or "youtu.be" in url.lower()
-
-def extract_video_id(url: str) -> str:
-    """
-    Extracts a YouTube video ID from a typical YouTube/YouTu.be link.
+def main(
+    input_path: str,
+    persist_directory: str = "./chromadb",
+    parent_mode: bool = False,
+    docstore_directory: str = DOCSTORE_DIRECTORY,
+    youtube_options: dict = None,
+):
     """
-    if "youtu.be/" in url:
-        # Format like: https://youtu.be/<VIDEO_ID>?...
-        return url.split("youtu.be/")[-1].split("?")[0]
-    elif "v=" in url:
-        # Format like: https://www.youtube.com/watch?v=<VIDEO_ID>&...
-        return url.split("v=")[-1].split("&")[0]
-    else:
-        raise ValueError(f"Could not parse video ID from url: {url}")
-
-def load_youtube_transcript(url: str) -> list[Document]:
-    """
-    Fetches the YouTube transcript using youtube-transcript-api
-    and returns a single Document object containing the transcript text.
-    """
-    video_id = extract_video_id(url)
-    try:
-        transcript_data = YouTubeTranscriptApi.get_transcript(video_id, languages=["en", "ru"])
-    except Exception as e:
-        raise ValueError(f"Failed to get YouTube transcript: {e}") from e
-
-    # Combine all text segments
-    transcript_text = " ".join(segment["text"] for segment in transcript_data)
-    # Create a single Document
-    return [Document(page_content=transcript_text, metadata={"source": url})]
-
-###############################################################################
-# 2. Ingest Function
-###############################################################################
-def main(input_path: str, persist_directory: str = "./chromadb"):
-    """
-    Loads a PDF or a YouTube transcript, splits it into chunks,
+    Loads a PDF or YouTube transcripts, splits them into chunks,
     and appends them to a local Chroma DB (creates if it doesn't exist).
+    In parent mode the chunks go to the parent/child index instead.
+
+    `youtube_options` are passed to youtube_loader.load_youtube_documents
+    (source, cache_directory, concurrency, rate).
     """
 
     load_dotenv()  # So we get OPENAI_API_KEY, etc.
@@ -84,19 +63,31 @@ def main(input_path: str, persist_directory: str = "./chromadb"):
         loader = PyPDFLoader(input_path)
         docs = loader.load()
         print(f"Loaded {len(docs)} pages from PDF: {input_path}")
-    elif is_youtube_link(input_path):
-        # It's a YouTube link
-        docs = load_youtube_transcript(input_path)
-        print(f"Loaded transcript from YouTube video: {input_path}")
+    elif input_path.lower().endswith(".txt") or is_youtube_link(input_path):
+        # A YouTube video/playlist link, or a file with a list of them
+        urls = read_url_list(input_path) if input_path.lower().endswith(".txt") else [input_path]
+        # Already split into timestamped chunks
+        docs = load_youtube_documents(urls, **(youtube_options or {}))
+        if not docs:
+            # Failed videos are skipped, so nothing may be left to index
+            raise ValueError(f"Failed to get YouTube transcripts for: {input_path}")
+        print(f"Loaded {len(docs)} timestamped chunks from YouTube: {input_path}")
     else:
-        raise ValueError("Input must be a path to a .pdf or a YouTube link.")
+        raise ValueError("Input must be a path to a .pdf, a .txt URL list or a YouTube link.")
 
-    # 2) Split the documents into smaller chunks
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=1000,
-        chunk_overlap=200
-    )
-    chunks = text_splitter.split_documents(docs)
+    if parent_mode:
+        ingest_parent_documents(docs, persist_directory, docstore_directory)
+        return
+
+    # 2) Split the documents into smaller chunks (transcripts are split on load)
+    if input_path.lower().endswith(".pdf"):
+        text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            chunk_size=1000,
+            chunk_overlap=200
+        )
+        chunks = text_splitter.split_documents(docs)
+    else:
+        chunks = docs
     print(f"Split into {len(chunks)} chunks.")
 
     # 3) Create or open existing Chroma collection
@@ -119,17 +110,51 @@ def main(input_path: str, persist_directory: str = "./chromadb"):
         # Some newer versions auto-persist, so no 'persist' method is needed
         print("Chroma changes saved (auto-persist).")
 
+def ingest_parent_documents(
+    docs: list[Document], persist_directory: str, docstore_directory: str
+):
+    """
+    Splits documents into parent sections and child chunks, embeds the
+    children into the child collection and stores the parents in the docstore.
+    """
+    retriever = get_parent_retriever(
+        OpenAIEmbeddings(),  # needs OPENAI_API_KEY
+        persist_directory=persist_directory,
+        docstore_directory=docstore_directory,
+    )
+    retriever.add_documents(docs)
+    print(
+        f"Added {len(docs)} documents to the parent/child index "
+        f"(children in {persist_directory}, parents in {docstore_directory})."
+    )
+
 ###############################################################################
-# 3. CLI
+# 2. CLI
 ###############################################################################
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python ingest.py <PDF_FILE_OR_YOUTUBE_URL> [PERSIST_DIRECTORY]")
-        sys.exit(1)
-
-    input_arg = sys.argv[1]
-    if len(sys.argv) > 2:
-        persist_dir = sys.argv[2]
-        main(input_arg, persist_dir)
-    else:
-        main(input_arg)
+    parser = argparse.ArgumentParser(description="Ingest a PDF or YouTube transcript into Chroma.")
+    parser.add_argument("input", help="Path to a .pdf file or a YouTube link")
+    parser.add_argument("persist_directory", nargs="?", default="./chromadb")
+    parser.add_argument(
+        "--parent",
+        action="store_true",
+        help="Index small child chunks and store their parent sections in the docstore",
+    )
+    parser.add_argument("--docstore", default=DOCSTORE_DIRECTORY, help="Parent docstore directory")
+    parser.add_argument("--transcripts-cache", default=TRANSCRIPT_CACHE_DIRECTORY,
+                        help="Directory of cached raw YouTube transcripts")
+    parser.add_argument("--transcript-source", default=None,
+                        help="Read transcripts from <dir>/<video_id>.json instead of YouTube")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Maximum number of concurrent transcript fetches")
+    parser.add_argument("--rate", type=float, default=2.0,
+                        help="Maximum number of transcript fetches started per second")
+    args = parser.parse_args()
+
+    main(args.input, args.persist_directory, args.parent, args.docstore, {
+        "source": (DirectoryTranscriptSource(args.transcript_source)
+                   if args.transcript_source else None),
+        "cache_directory": args.transcripts_cache,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+    })
@@ -0,0 +1,348 @@
+"""
+Load test for the Telegram bot without real Telegram or OpenAI.
+
+The tool starts a fake Telegram Bot API (fake_telegram.py) and a fake
+OpenAI-compatible server with a configurable latency distribution
+(fake_openai.py), seeds a small Chroma snapshot with fake embeddings, and
+runs bot.py in a child process pointed at them. Virtual users are ramped up,
+each sending a question and waiting for the reply in its own chat. The
+report covers throughput, end-to-end latency percentiles, the event-loop
+lag of the bot process and its memory growth.
+
+Usage:
+    python loadtest.py [--users 100] [--ramp 10] [--duration 60]
+                       [--llm-latency 0.5] [--llm-latency-sigma 0.3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+from fake_openai import FakeOpenAIConfig, FakeOpenAIServer, fake_embedding
+from fake_telegram import FakeTelegramServer
+
+LOADTEST_PREFIX = "LOADTEST "
+BOT_TOKEN = "123456:loadtest"
+ERROR_REPLY_MARKERS = ("error occurred", "Invalid input", "too complex")
+QUESTIONS = [
+    "What was the net profit in 2023?",
+    "How many clients does the bank have?",
+    "What are the main strategic goals?",
+    "How did the loan portfolio change?",
+]
+# Local copy of the rlm/rag-prompt, so the bot does not reach LangChain Hub
+RAG_PROMPT = (
+    "You are an assistant for question-answering tasks. Use the following pieces of "
+    "retrieved context to answer the question. If you don't know the answer, just say "
+    "that you don't know. Use three sentences maximum and keep the answer concise.\n"
+    "Question: {question} \nContext: {context} \nAnswer:"
+)
+
+
+def percentile(values: List[float], quantile: float) -> float:
+    """
+    Returns the value at the given quantile (0..1) of the values, 0 if empty.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+def read_rss_kb(pid) -> Optional[int]:
+    """
+    Returns the resident memory of a process in KiB (Linux only).
+    """
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (FileNotFoundError, ProcessLookupError):
+        pass
+    return None
+
+
+###############################################################################
+# 1. Bot process
+###############################################################################
+async def run_bot_process(lag_interval: float):
+    """
+    Runs the bot against the fake servers configured in the environment and
+    reports the event-loop lag once a second as LOADTEST-prefixed JSON lines.
+    """
+    # pylint: disable=import-outside-toplevel
+    # bot first: it swaps in pysqlite3 before agent imports chromadb
+    import bot
+    import agent
+    from compressor import WordCountEncoding
+    from langchain_core.prompts import ChatPromptTemplate
+
+    # Nothing may leave the machine: no LangChain Hub, no tiktoken downloads
+    agent.hub.pull = lambda _name: ChatPromptTemplate.from_template(RAG_PROMPT)
+    agent.get_encoding = lambda _model: WordCountEncoding()
+    agent.embeddings.embeddings.check_embedding_ctx_length = False
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+
+    application = bot.build_application(BOT_TOKEN, os.environ["TELEGRAM_API_BASE_URL"])
+    async with application:
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+        await application.start()
+        print(LOADTEST_PREFIX + json.dumps({"ready": True}), flush=True)
+
+        lags = []
+        reported_at = time.monotonic()
+        while not stop.is_set():
+            started = time.monotonic()
+            await asyncio.sleep(lag_interval)
+            lags.append(max(0.0, time.monotonic() - started - lag_interval) * 1000)
+            if time.monotonic() - reported_at >= 1.0:
+                print(LOADTEST_PREFIX + json.dumps({"lag_ms": lags}), flush=True)
+                lags, reported_at = [], time.monotonic()
+
+        await application.updater.stop()
+        await application.stop()
+
+
+###############################################################################
+# 2. Load generator
+###############################################################################
+def seed_index(snapshot_root: str, documents: int):
+    """
+    Publishes a Chroma snapshot of synthetic documents embedded with the
+    fake server's embedding function.
+    """
+    # pylint: disable=import-outside-toplevel
+    from index_maintenance import open_client, publish_snapshot, release_clients
+
+    texts = [
+        f"Section {i}: the bank reported figures for segment {i % 17}." for i in range(documents)
+    ]
+    collection = open_client(os.path.join(snapshot_root, "v0001")).create_collection(
+        "rag-chroma", embedding_function=None
+    )
+    collection.add(
+        ids=[str(i) for i in range(documents)],
+        documents=texts,
+        metadatas=[{"source": "synthetic.pdf", "page": i} for i in range(documents)],
+        embeddings=[fake_embedding(text) for text in texts],
+    )
+    release_clients()
+    publish_snapshot("v0001", snapshot_root)
+
+
+class LoadResults:
+    """
+    Thread-safe collection of per-request outcomes. Latencies are kept for
+    successful replies only, so fast error replies do not flatter the report.
+    """
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.timeouts = 0
+        self.active_users = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: Optional[float], error: bool = False):
+        """
+        Records a reply latency in seconds, or a timeout when latency is None.
+        """
+        with self._lock:
+            if latency is None:
+                self.timeouts += 1
+            elif error:
+                self.errors += 1
+            else:
+                self.latencies.append(latency)
+
+    def user_started(self):
+        """
+        Counts a virtual user that started sending messages.
+        """
+        with self._lock:
+            self.active_users += 1
+
+
+def virtual_user(server: FakeTelegramServer, chat_id: int, *,  # pylint: disable=too-many-arguments
+                 start_at: float, stop_at: float, think_time: float, reply_timeout: float,
+                 results: LoadResults):
+    """
+    Sends questions in one chat, one at a time, until `stop_at`.
+    A user whose reply times out stops, so a late reply is not attributed
+    to its next question.
+    """
+    time.sleep(max(0.0, start_at - time.monotonic()))
+    results.user_started()
+    rng = random.Random(chat_id)
+    while time.monotonic() < stop_at:
+        sent_at = time.monotonic()
+        server.send_user_message(chat_id, rng.choice(QUESTIONS))
+        reply = server.wait_for_reply(chat_id, reply_timeout)
+        if reply is None:
+            results.record(None)
+            return
+        error = any(marker in reply["text"] for marker in ERROR_REPLY_MARKERS)
+        results.record(time.monotonic() - sent_at, error)
+        time.sleep(think_time * rng.uniform(0.5, 1.5))
+
+
+def _read_bot_output(process: subprocess.Popen, lags: List[float], ready: threading.Event):
+    for line in process.stdout:
+        if not line.startswith(LOADTEST_PREFIX):
+            continue
+        record = json.loads(line[len(LOADTEST_PREFIX):])
+        if record.get("ready"):
+            ready.set()
+        lags.extend(record.get("lag_ms", []))
+
+
+def _sample_memory(pid: int, samples: List[int], stop: threading.Event):
+    while not stop.wait(0.5):
+        rss = read_rss_kb(pid)
+        if rss is not None:
+            samples.append(rss)
+
+
+def run_load_test(options: argparse.Namespace) -> Dict[str, float]:  # pylint: disable=too-many-locals
+    """
+    Runs the whole load test and returns the report.
+    """
+    openai_config = FakeOpenAIConfig(latency=options.llm_latency,
+                                     latency_sigma=options.llm_latency_sigma,
+                                     error_rate=options.llm_error_rate)
+    with tempfile.TemporaryDirectory() as snapshot_root, \
+            open(options.bot_log, "w", encoding="utf-8") as bot_log, \
+            FakeTelegramServer() as telegram, FakeOpenAIServer(openai_config) as openai_server:
+        seed_index(snapshot_root, options.documents)
+        env = dict(
+            os.environ,
+            TELEGRAM_API_BASE_URL=telegram.base_url,
+            OPENAI_BASE_URL=openai_server.base_url,
+            OPENAI_API_KEY="loadtest",
+            LANGCHAIN_TRACING_V2="false",
+            ANONYMIZED_TELEMETRY="False",
+            SNAPSHOT_ROOT=snapshot_root,
+            PYTHONUNBUFFERED="1",
+        )
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, os.path.abspath(__file__), "--bot-process",
+             "--lag-interval", str(options.lag_interval)],
+            env=env, stdout=subprocess.PIPE, stderr=bot_log, text=True,
+        )
+        lags, memory, ready, stop_sampling = [], [], threading.Event(), threading.Event()
+        threading.Thread(target=_read_bot_output, args=(process, lags, ready), daemon=True).start()
+        try:
+            if not ready.wait(options.startup_timeout):
+                raise RuntimeError(f"Bot process did not start; see {options.bot_log}")
+            threading.Thread(target=_sample_memory, args=(process.pid, memory, stop_sampling),
+                             daemon=True).start()
+            lags.clear()
+
+            results = LoadResults()
+            started = time.monotonic()
+            stop_at = started + options.ramp + options.duration
+            users = [
+                threading.Thread(target=virtual_user, args=(telegram, 1000 + i), daemon=True,
+                                 kwargs={
+                                     "start_at": started + options.ramp * i / options.users,
+                                     "stop_at": stop_at,
+                                     "think_time": options.think_time,
+                                     "reply_timeout": options.reply_timeout,
+                                     "results": results,
+                                 })
+                for i in range(options.users)
+            ]
+            for user in users:
+                user.start()
+            for user in users:
+                user.join()
+            elapsed = time.monotonic() - started
+        finally:
+            stop_sampling.set()
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    latencies = results.latencies
+    return {
+        "users": results.active_users,
+        "elapsed_s": elapsed,
+        "replies": len(latencies) + results.errors,
+        "successes": len(latencies),
+        "errors": results.errors,
+        "timeouts": results.timeouts,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_p50_ms": percentile(latencies, 0.50) * 1000,
+        "latency_p90_ms": percentile(latencies, 0.90) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "latency_max_ms": max(latencies, default=0.0) * 1000,
+        "loop_lag_p50_ms": percentile(lags, 0.50),
+        "loop_lag_p99_ms": percentile(lags, 0.99),
+        "loop_lag_max_ms": max(lags, default=0.0),
+        "rss_start_mb": memory[0] / 1024 if memory else 0.0,
+        "rss_peak_mb": max(memory, default=0) / 1024,
+        "rss_growth_mb": (memory[-1] - memory[0]) / 1024 if memory else 0.0,
+        "llm_requests": openai_server.request_counts.get("/v1/chat/completions", 0),
+    }
+
+
+def print_report(report: Dict[str, float]):
+    """
+    Prints the load test report.
+    """
+    print(f"Virtual users:     {report['users']} over {report['elapsed_s']:.1f}s")
+    print(f"Replies:           {report['replies']} ({report['successes']} successful, "
+          f"{report['errors']} error replies, {report['timeouts']} timeouts)")
+    print(f"Throughput:        {report['throughput_rps']:.2f} successful replies/s "
+          f"({report['llm_requests']} LLM requests)")
+    print(f"Successful (ms):   p50 {report['latency_p50_ms']:.0f}  "
+          f"p90 {report['latency_p90_ms']:.0f}  p99 {report['latency_p99_ms']:.0f}  "
+          f"max {report['latency_max_ms']:.0f}")
+    print(f"Event-loop lag:    p50 {report['loop_lag_p50_ms']:.1f} ms  "
+          f"p99 {report['loop_lag_p99_ms']:.1f} ms  max {report['loop_lag_max_ms']:.1f} ms")
+    print(f"Bot memory (RSS):  start {report['rss_start_mb']:.1f} MB  "
+          f"peak {report['rss_peak_mb']:.1f} MB  growth {report['rss_growth_mb']:+.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the bot with fake Telegram/OpenAI.")
+    parser.add_argument("--users", type=int, default=100, help="Number of virtual users")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Ramp-up time, seconds")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="Time at full load after the ramp-up, seconds")
+    parser.add_argument("--think-time", type=float, default=1.0,
+                        help="Mean pause between a reply and the next question, seconds")
+    parser.add_argument("--reply-timeout", type=float, default=120.0)
+    parser.add_argument("--llm-latency", type=float, default=0.5,
+                        help="Median fake LLM latency, seconds")
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.3,
+                        help="Lognormal shape of the fake LLM latency; 0 means fixed")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--documents", type=int, default=200,
+                        help="Synthetic documents in the seeded index")
+    parser.add_argument("--lag-interval", type=float, default=0.05,
+                        help="Event-loop lag sampling interval, seconds")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--bot-log", default="loadtest_bot.log",
+                        help="File receiving the bot process's log output")
+    parser.add_argument("--bot-process", action="store_true", help=argparse.SUPPRESS)
+    cli_args = parser.parse_args()
+
+    if cli_args.bot_process:
+        asyncio.run(run_bot_process(cli_args.lag_interval))
+    else:
+        print_report(run_load_test(cli_args))
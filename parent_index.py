@@ -0,0 +1,111 @@
+"""
+This module sets up the hierarchical (parent/child) index. Small child chunks
+are embedded and searched in Chroma, while their parent sections are kept in a
+local docstore and returned for generation. Several children that hit the same
+parent yield that parent only once.
+
+Context size trade-off: parents are up to PARENT_CHUNK_SIZE tokens and at
+most MAX_PARENTS of them are returned, so the retrieved context is bounded by
+4 x 1000 tokens, the same as the flat index (4 chunks of 1000). Larger
+parents or more of them give the model more surrounding text, but
+grade_documents receives the context uncompressed.
+"""
+
+from typing import List, Optional
+
+from langchain.retrievers import ParentDocumentRetriever
+from langchain.storage import LocalFileStore, create_kv_docstore
+from langchain.text_splitter import RecursiveCharacterTextSplitter, TextSplitter
+from langchain_chroma import Chroma
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+CHILD_COLLECTION_NAME = "rag-chroma-children"
+DOCSTORE_DIRECTORY = "./docstore"
+
+# Children are small for precise search; parents are page/section sized
+CHILD_CHUNK_SIZE = 200
+CHILD_CHUNK_OVERLAP = 40
+PARENT_CHUNK_SIZE = 1000
+# Number of children to search; parents are deduplicated, so fewer are returned
+CHILD_SEARCH_K = 8
+# Parents returned at most, in the rank order of their best child
+MAX_PARENTS = 4
+
+
+class CappedParentDocumentRetriever(ParentDocumentRetriever):
+    """
+    A ParentDocumentRetriever that returns at most `max_parents` parents.
+    """
+    max_parents: int = MAX_PARENTS
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        documents = super()._get_relevant_documents(query, run_manager=run_manager)
+        return documents[:self.max_parents]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        documents = await super()._aget_relevant_documents(query, run_manager=run_manager)
+        return documents[:self.max_parents]
+
+
+def get_parent_retriever(  # pylint: disable=too-many-arguments
+    embeddings: Embeddings,
+    persist_directory: str = "./chromadb",
+    docstore_directory: str = DOCSTORE_DIRECTORY,
+    *,
+    child_splitter: Optional[TextSplitter] = None,
+    parent_splitter: Optional[TextSplitter] = None,
+    max_parents: int = MAX_PARENTS,
+) -> ParentDocumentRetriever:
+    """
+    Creates a retriever over the child-chunk collection and the parent docstore.
+
+    The same retriever is used by ingest (add_documents) and by the agent
+    (invoke), so both sides agree on collection, docstore and splitters.
+
+    Args:
+        embeddings (Embeddings): Embedding model for the child chunks.
+        persist_directory (str): Chroma directory holding the child collection.
+        docstore_directory (str): Directory of the parent docstore.
+        child_splitter (TextSplitter, optional): Splitter for child chunks.
+        parent_splitter (TextSplitter, optional): Splitter for parent sections.
+        max_parents (int): Maximum number of parents returned per search.
+
+    Returns:
+        ParentDocumentRetriever: Retriever returning deduplicated parent documents.
+    """
+    if child_splitter is None:
+        child_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            chunk_size=CHILD_CHUNK_SIZE,
+            chunk_overlap=CHILD_CHUNK_OVERLAP,
+        )
+    if parent_splitter is None:
+        # Pages shorter than the limit stay whole; long transcripts get sectioned
+        parent_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            chunk_size=PARENT_CHUNK_SIZE,
+            chunk_overlap=0,
+        )
+
+    vectorstore = Chroma(
+        collection_name=CHILD_COLLECTION_NAME,
+        persist_directory=persist_directory,
+        embedding_function=embeddings,
+    )
+    docstore = create_kv_docstore(LocalFileStore(docstore_directory))
+
+    return CappedParentDocumentRetriever(
+        vectorstore=vectorstore,
+        docstore=docstore,
+        child_splitter=child_splitter,
+        parent_splitter=parent_splitter,
+        search_kwargs={"k": CHILD_SEARCH_K},
+        max_parents=max_parents,
+    )
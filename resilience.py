@@ -0,0 +1,380 @@
+"""
+This module provides a resilient call layer for the upstream LLM API. Every
+call runs under a deadline, failed calls are retried with jittered exponential
+backoff, slow calls can be hedged with a duplicate request after a p95-based
+delay, and a circuit breaker fails fast while the upstream is down. When the
+primary model is unavailable, the call falls back to a cheaper model.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("rag_logger")
+
+
+class UpstreamUnavailableError(RuntimeError):
+    """
+    Base class for errors raised when the upstream could not answer in time.
+    """
+
+
+class DeadlineExceededError(UpstreamUnavailableError):
+    """
+    Raised when a call does not complete before its deadline.
+    """
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """
+    Raised when the circuit breaker is open and calls are not attempted.
+    """
+
+
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are rejected for `reset_timeout` seconds. Then one trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+
+    @property
+    def state(self) -> str:
+        """
+        The current state: 'closed', 'open' or 'half-open'.
+        """
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Returns True if a call may be attempted now.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                # Let a single trial call through
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        """
+        Records a successful call and closes the circuit.
+        """
+        with self._lock:
+            self._failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        """
+        Records a failed call, opening the circuit if the threshold is reached.
+        """
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Circuit breaker opened after %d failures", self._failures)
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class LatencyTracker:
+    """
+    Keeps a rolling window of call latencies and reports their percentiles.
+    """
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float):
+        """
+        Adds a latency sample in seconds.
+        """
+        self._samples.append(seconds)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        """
+        Returns the latency at the given quantile (0..1), or None if empty.
+        """
+        samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(quantile * len(samples)))
+        return samples[index]
+
+
+class ResilientClient:  # pylint: disable=too-many-instance-attributes
+    """
+    Runs upstream calls with deadlines, retries, hedging and circuit breaking.
+
+    Args:
+        deadlines (dict): Per-node deadlines in seconds.
+        default_deadline (float): Deadline for nodes not in `deadlines`.
+        max_retries (int): Retries after the first failed attempt.
+        backoff_base (float): Base delay of the exponential backoff.
+        backoff_cap (float): Maximum backoff delay before jitter.
+        hedge (bool): Whether to send a duplicate request for slow calls.
+        hedge_quantile (float): Latency quantile after which to hedge; latencies
+            are tracked per node, since nodes differ widely in call length.
+        hedge_min_delay (float): Hedge delay used until enough samples exist.
+        hedge_min_samples (int): Samples needed before the quantile is used.
+        breaker (CircuitBreaker, optional): Circuit breaker for the primary model.
+        fallback_breaker (CircuitBreaker, optional): Circuit breaker for the
+            fallback model, so that an outage of both fails fast.
+        fallback_reserve (float): Share of a node's deadline kept for the
+            fallback; the primary gets the rest, so both fit into the deadline.
+        retry_on (tuple): Exception types treated as upstream failures.
+    """
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        *,
+        deadlines: Optional[Dict[str, float]] = None,
+        default_deadline: float = 30.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 4.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 2.0,
+        hedge_min_samples: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+        fallback_breaker: Optional[CircuitBreaker] = None,
+        fallback_reserve: float = 0.25,
+        retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+    ):
+        self.deadlines = deadlines or {}
+        self.default_deadline = default_deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.fallback_breaker = fallback_breaker or CircuitBreaker()
+        self.fallback_reserve = fallback_reserve
+        self.retry_on = retry_on
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._latencies_lock = threading.Lock()
+        # Calls run in worker threads so that they can be abandoned at the deadline
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-call")
+
+    def deadline_for(self, node: str) -> float:
+        """
+        Returns the deadline in seconds for the given node.
+        """
+        return self.deadlines.get(node, self.default_deadline)
+
+    def latencies(self, name: str) -> LatencyTracker:
+        """
+        Returns the latency tracker of the given node, creating it if needed.
+        """
+        with self._latencies_lock:
+            return self._latencies.setdefault(name, LatencyTracker())
+
+    def hedge_delay(self, name: str = "call") -> float:
+        """
+        Returns how long to wait before hedging a call of the given node.
+        """
+        tracker = self.latencies(name)
+        if len(tracker) < self.hedge_min_samples:
+            return self.hedge_min_delay
+        return tracker.percentile(self.hedge_quantile)
+
+    def invoke(self, node: str, runnable: Any, inputs: Any, fallback: Any = None) -> Any:
+        """
+        Invokes a runnable under the node's deadline and retry policy.
+
+        If the primary runnable fails with an upstream error, times out or the
+        circuit is open, `fallback` (if given) is invoked once with the rest of
+        the node's deadline, under its own circuit breaker. With a fallback the
+        primary may use all but `fallback_reserve` of the deadline, so the node
+        never takes longer than its deadline.
+
+        Args:
+            node (str): Name of the graph node making the call.
+            runnable: Object with an `invoke(inputs)` method (model or chain).
+            inputs: Inputs passed to `invoke`.
+            fallback: Optional runnable used when the primary is unavailable.
+
+        Returns:
+            The result of `runnable.invoke(inputs)` or `fallback.invoke(inputs)`.
+        """
+        deadline = self.deadline_for(node)
+        if fallback is None:
+            return self.call(lambda: runnable.invoke(inputs), deadline, name=node)
+        deadline_at = time.monotonic() + deadline
+        try:
+            return self.call(lambda: runnable.invoke(inputs),
+                             deadline * (1 - self.fallback_reserve), name=node)
+        except (UpstreamUnavailableError, *self.retry_on) as e:
+            logger.warning("%s: primary model unavailable (%s), using fallback", node, e)
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceededError(f"{node}: no time left for the fallback") from e
+            return self.call(lambda: fallback.invoke(inputs), remaining, name=f"{node}:fallback",
+                             breaker=self.fallback_breaker, max_retries=0, hedge=False)
+
+    def call(  # pylint: disable=too-many-arguments
+        self,
+        fn: Callable[[], Any],
+        deadline: float,
+        name: str = "call",
+        *,
+        breaker: Optional[CircuitBreaker] = None,
+        max_retries: Optional[int] = None,
+        hedge: Optional[bool] = None,
+    ) -> Any:
+        """
+        Calls `fn` with retries, hedging and circuit breaking.
+
+        Args:
+            fn (Callable): The call to make.
+            deadline (float): Total time budget in seconds, retries included.
+            name (str): Name used in log messages and for latency tracking.
+            breaker (CircuitBreaker, optional): Breaker to use instead of `breaker`.
+            max_retries (int, optional): Overrides the client's `max_retries`.
+            hedge (bool, optional): Overrides the client's `hedge`.
+
+        Returns:
+            The result of `fn()`.
+
+        Raises:
+            CircuitOpenError: If the circuit breaker rejects the call.
+            DeadlineExceededError: If no attempt completes before the deadline.
+        """
+        breaker = breaker or self.breaker
+        max_retries = self.max_retries if max_retries is None else max_retries
+        hedge = self.hedge if hedge is None else hedge
+        deadline_at = time.monotonic() + deadline
+        for attempt in range(max_retries + 1):
+            if not breaker.allow():
+                raise CircuitOpenError(f"{name}: circuit breaker is open")
+            try:
+                return self._attempt(fn, deadline_at, name, breaker, hedge)
+            except DeadlineExceededError:
+                raise
+            except self.retry_on as e:
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                if attempt == max_retries or time.monotonic() + delay >= deadline_at:
+                    raise
+                logger.warning("%s: attempt %d failed (%s), retrying in %.2fs",
+                               name, attempt + 1, e, delay)
+                time.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def _attempt(  # pylint: disable=too-many-arguments
+        self, fn: Callable[[], Any], deadline_at: float, name: str,
+        breaker: CircuitBreaker, hedge: bool,
+    ) -> Any:
+        """
+        Runs one attempt and settles the circuit breaker whatever the outcome,
+        so that a half-open trial call never leaves the circuit stuck.
+        """
+        upstream_failed = True  # also when interrupted
+        try:
+            result = self._run(fn, deadline_at, name, hedge=hedge)
+            upstream_failed = False
+            return result
+        except Exception as e:
+            # Errors outside retry_on (bad request, unparsable reply) mean the
+            # upstream did answer
+            upstream_failed = isinstance(e, (DeadlineExceededError, *self.retry_on))
+            raise
+        finally:
+            if upstream_failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+    @staticmethod
+    def _timed(fn: Callable[[], Any], tracker: LatencyTracker) -> Any:
+        started = time.monotonic()
+        result = fn()
+        tracker.record(time.monotonic() - started)
+        return result
+
+    def _run(self, fn: Callable[[], Any], deadline_at: float, name: str, hedge: bool) -> Any:
+        """
+        Runs a single attempt, plus at most one hedged duplicate.
+        The first successful response wins; the slower one is abandoned.
+        """
+        tracker = self.latencies(name)
+        pending = {self._executor.submit(self._timed, fn, tracker)}
+        hedge_at = time.monotonic() + self.hedge_delay(name) if hedge else None
+        error = None
+        while pending:
+            now = time.monotonic()
+            if now >= deadline_at:
+                raise DeadlineExceededError("call did not complete before its deadline")
+            wake_at = deadline_at if hedge_at is None else min(deadline_at, hedge_at)
+            done, pending = wait(pending, timeout=wake_at - now, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if hedge_at is not None and pending and time.monotonic() >= hedge_at:
+                logger.info("%s: hedging slow call after %.2fs", name, self.hedge_delay(name))
+                pending.add(self._executor.submit(self._timed, fn, tracker))
+                hedge_at = None
+        raise error
+
+
+class ResilientEmbeddings(Embeddings):
+    """
+    Embeddings whose upstream calls go through a ResilientClient, so that
+    they share its deadlines, retries and circuit breaker. Embeddings have
+    no fallback model: when the upstream is unavailable the error is raised.
+
+    Args:
+        embeddings (Embeddings): The wrapped embedding model; its own retries
+            should be disabled.
+        client (ResilientClient): The client running the calls.
+        node (str): Name used for the deadline, latency tracking and logs.
+    """
+    def __init__(self, embeddings: Embeddings, client: ResilientClient, node: str = "embeddings"):
+        self.embeddings = embeddings
+        self.client = client
+        self.node = node
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds documents under the node's deadline and retry policy.
+        """
+        return self.client.call(lambda: self.embeddings.embed_documents(texts),
+                                self.client.deadline_for(self.node), name=self.node)
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embeds a query under the node's deadline and retry policy.
+        """
+        return self.client.call(lambda: self.embeddings.embed_query(text),
+                                self.client.deadline_for(self.node), name=self.node)
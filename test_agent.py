@@ -31,9 +31,11 @@ class TestAgent(unittest.TestCase):
         self.assertEqual(result["messages"][0].content, "Rewritten question")
         mock_model.invoke.assert_called_once()
 
+    @patch("agent.get_encoding")
+    @patch("agent.compress_context")
     @patch("agent.ChatOpenAI")
     @patch("agent.hub.pull")
-    def test_generate(self, mock_hub_pull, mock_chat_openai):
+    def test_generate(self, mock_hub_pull, mock_chat_openai, mock_compress_context, _):
         """
         Test the generate function to ensure it correctly processes the input 
         state, interacts with the mocked hub and ChatOpenAI model, and returns 
@@ -47,6 +49,8 @@ class TestAgent(unittest.TestCase):
         mock_response.content = "Generated answer"
         mock_model.invoke.return_value = mock_response
 
+        mock_compress_context.return_value = "Compressed documents"
+
         # Ensure the chain of calls in generate is properly mocked
         mock_hub_pull.return_value.__or__.return_value.__or__.return_value = mock_model
 
@@ -60,7 +64,36 @@ class TestAgent(unittest.TestCase):
 
         self.assertEqual(result["messages"][0].content, "Generated answer")
         mock_hub_pull.assert_called_once_with("rlm/rag-prompt")
-        mock_model.invoke.assert_called_once()
+        mock_model.invoke.assert_called_once_with(
+            {"context": "Compressed documents", "question": "User question"}
+        )
+        mock_compress_context.assert_called_once()
+
+    @patch("agent.get_encoding")
+    @patch("agent.compress_context", side_effect=OSError("encoding download failed"))
+    @patch("agent.ChatOpenAI")
+    @patch("agent.hub.pull")
+    def test_generate_without_compression(self, mock_hub_pull, mock_chat_openai, *_):
+        """
+        Test that a failing context compression does not fail the answer:
+        the uncompressed documents are passed to the model instead.
+        """
+        mock_model = mock_chat_openai.return_value
+        mock_model.invoke.return_value = "Generated answer"
+        mock_hub_pull.return_value.__or__.return_value.__or__.return_value = mock_model
+
+        state = {
+            "messages": [
+                MagicMock(content="User question"),
+                MagicMock(content="Retrieved documents"),
+            ]
+        }
+        result = generate(state)
+
+        self.assertEqual(result["messages"][0], "Generated answer")
+        mock_model.invoke.assert_called_once_with(
+            {"context": "Retrieved documents", "question": "User question"}
+        )
 
     @patch("agent.graph.stream")
     def test_run_rag_agent(self, mock_stream):
@@ -0,0 +1,209 @@
+"""
+Unit tests for the compressor module. These tests check sentence splitting,
+deduplication of chunk overlap and budget-limited extractive compression
+using a deterministic fake embedding model.
+"""
+
+import time
+import unittest
+from unittest.mock import patch
+from langchain_core.embeddings import Embeddings
+
+from compressor import (
+    ENCODING_RETRY_SECONDS,
+    WordCountEncoding,
+    clear_encoding_cache,
+    compress_context,
+    count_tokens,
+    deduplicate_sentences,
+    get_encoding,
+    split_documents,
+    split_sentences,
+)
+
+VOCABULARY = ["revenue", "profit", "weather", "football", "employees"]
+
+
+class KeywordEmbeddings(Embeddings):
+    """
+    A fake embedding model: one dimension per vocabulary word.
+    """
+    def embed_documents(self, texts):
+        """Embeds each text with embed_query."""
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        """Marks which vocabulary words occur in the text."""
+        text = text.lower()
+        return [float(word in text) for word in VOCABULARY] + [0.1]
+
+
+class TestCompressor(unittest.TestCase):
+    """
+    Test suite for the compressor module.
+    """
+    def test_split_sentences(self):
+        """
+        Test that text is split on sentence punctuation and blank lines.
+        """
+        text = "First one. Second one!\n\nThird one"
+        self.assertEqual(split_sentences(text), ["First one.", "Second one!", "Third one"])
+
+    def test_deduplicate_sentences(self):
+        """
+        Test that exact repeats and overlap fragments are removed.
+        """
+        sentences = [
+            "Profit grew by 10%.",
+            "grew by 10%.",
+            "Revenue was stable.",
+            "Profit  grew by 10%.",
+            "The rest of the report.",
+        ]
+        self.assertEqual(
+            deduplicate_sentences(sentences),
+            ["Profit grew by 10%.", "Revenue was stable.", "The rest of the report."],
+        )
+
+    def test_deduplicate_matches_whole_words(self):
+        """
+        Test that a sentence that is only a substring inside another sentence's
+        words is kept.
+        """
+        sentences = ["Credit rose.", "It rose.", "rose."]
+        self.assertEqual(deduplicate_sentences(sentences), ["Credit rose.", "It rose."])
+
+    def test_deduplicate_prefers_full_sentence(self):
+        """
+        Test that a fragment kept first is replaced by the full sentence.
+        """
+        sentences = ["by 10%.", "Profit grew by 10%."]
+        self.assertEqual(deduplicate_sentences(sentences), ["Profit grew by 10%."])
+
+    def test_compress_context_under_budget(self):
+        """
+        Test that context within the budget is only deduplicated.
+        """
+        context = "Revenue was stable. Weather was fine.\n\nWeather was fine."
+        result = compress_context(
+            "What about revenue?", context, KeywordEmbeddings(), encoding=WordCountEncoding()
+        )
+        self.assertEqual(result, "Revenue was stable. Weather was fine.")
+
+    def test_compress_context_over_budget(self):
+        """
+        Test that the most relevant sentences are kept in their original order
+        and the result fits into the token budget.
+        """
+        encoding = WordCountEncoding()
+        context = " ".join([
+            "Football scores were discussed at length.",
+            "Profit increased by 12 percent in 2023.",
+            "The weather in Moscow was cold all year.",
+            "Revenue and profit both hit record highs.",
+            "Employees enjoyed the football tournament.",
+        ])
+        budget = count_tokens(
+            "Profit increased by 12 percent in 2023. Revenue and profit both hit record highs.",
+            encoding,
+        )
+        result = compress_context(
+            "How did profit and revenue change?",
+            context,
+            KeywordEmbeddings(),
+            max_tokens=budget,
+            encoding=encoding,
+        )
+        self.assertEqual(
+            result,
+            "Profit increased by 12 percent in 2023. Revenue and profit both hit record highs.",
+        )
+        self.assertLessEqual(count_tokens(result, encoding), budget)
+
+    def test_compress_context_min_similarity(self):
+        """
+        Test that sentences below the similarity threshold are dropped even
+        when the context fits into the budget.
+        """
+        context = "Profit increased. The weather was cold. Football was fun."
+        result = compress_context(
+            "Profit?",
+            context,
+            KeywordEmbeddings(),
+            max_tokens=1000,
+            min_similarity=0.5,
+            encoding=WordCountEncoding(),
+        )
+        self.assertEqual(result, "Profit increased.")
+
+    def test_split_documents(self):
+        """
+        Test that the tool output is split at source lines.
+        """
+        context = "First doc.\n\nMore.\nSource: a.pdf\n\nSecond doc.\nSource: b.pdf"
+        self.assertEqual(
+            split_documents(context),
+            [("First doc.\n\nMore.", "a.pdf"), ("\nSecond doc.", "b.pdf")],
+        )
+
+    def test_compress_context_keeps_sources(self):
+        """
+        Test that each document with a kept sentence keeps its own source
+        line, even when the sources repeat and the context is over budget.
+        """
+        encoding = WordCountEncoding()
+        link = "https://www.youtube.com/watch?v=vid&t=30s"
+        context = "\n\n".join([
+            "Football was discussed.\nSource: a.pdf",
+            f"Profit increased by 12 percent.\nSource: {link}",
+            "Revenue hit a record.\nSource: a.pdf",
+            "The weather was cold.\nSource: a.pdf",
+        ])
+        expected = (
+            f"Profit increased by 12 percent.\nSource: {link}"
+            "\n\nRevenue hit a record.\nSource: a.pdf"
+        )
+        result = compress_context(
+            "How did profit and revenue change?",
+            context,
+            KeywordEmbeddings(),
+            max_tokens=count_tokens(expected, encoding),
+            encoding=encoding,
+        )
+        self.assertEqual(result, expected)
+
+    def test_get_encoding_falls_back_and_retries(self):
+        """
+        Test that an encoding that cannot be downloaded falls back to an
+        estimating counter, that the failure is not retried on every call,
+        and that loading is retried after the retry interval.
+        """
+        clear_encoding_cache()
+        self.addCleanup(clear_encoding_cache)
+        with patch("compressor.tiktoken") as mock_tiktoken:
+            mock_tiktoken.encoding_for_model.side_effect = OSError("no network")
+            mock_tiktoken.get_encoding.side_effect = OSError("no network")
+            with self.assertLogs("rag_logger", level="WARNING"):
+                encoding = get_encoding("test-model")
+            get_encoding("test-model")
+            self.assertEqual(mock_tiktoken.encoding_for_model.call_count, 1)
+
+            with patch("compressor.time.monotonic",
+                       return_value=time.monotonic() + ENCODING_RETRY_SECONDS):
+                mock_tiktoken.encoding_for_model.side_effect = None
+                loaded = get_encoding("test-model")
+            self.assertIs(get_encoding("test-model"), loaded)
+
+        self.assertIsInstance(encoding, WordCountEncoding)
+        self.assertIs(loaded, mock_tiktoken.encoding_for_model.return_value)
+        self.assertEqual(mock_tiktoken.encoding_for_model.call_count, 2)
+
+    def test_fallback_encoding_overestimates_tokens(self):
+        """
+        Test that the fallback counts long words as several tokens.
+        """
+        encoding = WordCountEncoding(chars_per_token=3)
+        self.assertEqual(count_tokens("Чистая прибыль выросла", encoding), 8)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+"""
+Unit tests for the index_maintenance module. These tests build a small Chroma
+store with duplicate records in a temporary directory and check the health
+stats, compacted snapshots, publishing/rollback and the hot-swap retriever.
+"""
+
+import os
+import tempfile
+import unittest
+from typing import List
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from index_maintenance import (
+    HotSwapRetriever,
+    create_snapshot,
+    current_index_directory,
+    docstore_directory_for,
+    index_stats,
+    list_snapshots,
+    measure_query_latency,
+    open_client,
+    publish_snapshot,
+    release_clients,
+)
+
+from chromadb.api.client import SharedSystemClient
+
+
+class DirectoryRetriever(BaseRetriever):
+    """
+    A fake retriever that returns the directory it was built for.
+    """
+    directory: str
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [Document(page_content=self.directory)]
+
+
+class TestIndexMaintenance(unittest.TestCase):
+    """
+    Test suite for the index_maintenance module.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.source = os.path.join(self.tmpdir.name, "chromadb")
+        self.snapshots = os.path.join(self.tmpdir.name, "snapshots")
+
+        # Two ingests of the same three chunks plus one new chunk
+        collection = open_client(self.source).create_collection(
+            "rag-chroma", embedding_function=None
+        )
+        records = [
+            ("Profit grew.", {"source": "a.pdf", "page": 1}, [1.0, 0.0, 0.0]),
+            ("Revenue fell.", {"source": "a.pdf", "page": 2}, [0.0, 1.0, 0.0]),
+            ("Weather was mild.", {"source": "a.pdf", "page": 3}, [0.0, 0.0, 1.0]),
+        ]
+        records += records + [("New text.", {"source": "b.pdf", "page": 1}, [1.0, 1.0, 0.0])]
+        collection.add(
+            ids=[str(i) for i in range(len(records))],
+            documents=[r[0] for r in records],
+            metadatas=[r[1] for r in records],
+            embeddings=[r[2] for r in records],
+        )
+        release_clients()
+
+    def tearDown(self):
+        release_clients()
+        self.tmpdir.cleanup()
+
+    def test_index_stats(self):
+        """
+        Test that element count and duplicate ratio are reported.
+        """
+        stats = index_stats(self.source)
+
+        self.assertGreater(stats["_directory"]["total_bytes"], 0)
+        self.assertEqual(stats["rag-chroma"]["elements"], 7)
+        self.assertEqual(stats["rag-chroma"]["duplicates"], 3)
+        self.assertAlmostEqual(stats["rag-chroma"]["duplicate_ratio"], 3 / 7)
+
+    def test_snapshot_compacts_with_hnsw_params(self):
+        """
+        Test that a snapshot drops duplicates, applies the HNSW parameters and
+        leaves the working directory untouched.
+        """
+        hnsw = {"hnsw:M": 8, "hnsw:construction_ef": 64, "hnsw:search_ef": 32}
+        version = create_snapshot(self.source, self.snapshots, hnsw)
+
+        self.assertEqual(version, "v0001")
+        stats = index_stats(os.path.join(self.snapshots, version))
+        self.assertEqual(stats["rag-chroma"]["elements"], 4)
+        self.assertEqual(stats["rag-chroma"]["duplicates"], 0)
+        self.assertEqual(stats["rag-chroma"]["hnsw"], hnsw)
+        self.assertEqual(index_stats(self.source)["rag-chroma"]["elements"], 7)
+
+        latency = measure_query_latency(
+            os.path.join(self.snapshots, version), "rag-chroma", [[1.0, 0.0, 0.0]] * 5
+        )
+        self.assertGreater(latency["p95_ms"], 0)
+
+    def test_snapshot_copies_docstore(self):
+        """
+        Test that the parent docstore is copied into the snapshot, so later
+        ingests do not change the parents a published snapshot serves.
+        """
+        docstore = os.path.join(self.tmpdir.name, "docstore")
+        os.makedirs(docstore)
+        with open(os.path.join(docstore, "parent-1"), "w", encoding="utf-8") as f:
+            f.write("first ingest")
+
+        version = create_snapshot(self.source, self.snapshots, docstore_directory=docstore)
+        with open(os.path.join(docstore, "parent-1"), "w", encoding="utf-8") as f:
+            f.write("second ingest")
+
+        snapshot_docstore = docstore_directory_for(os.path.join(self.snapshots, version))
+        with open(os.path.join(snapshot_docstore, "parent-1"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), "first ingest")
+        self.assertEqual(docstore_directory_for(self.source, default=docstore), docstore)
+
+    def test_snapshot_requires_docstore_for_parent_index(self):
+        """
+        Test that a parent/child index is not snapshotted without its docstore.
+        """
+        open_client(self.source).create_collection("rag-chroma-children")
+        release_clients()
+
+        with self.assertRaises(ValueError):
+            create_snapshot(self.source, self.snapshots,
+                            docstore_directory=os.path.join(self.tmpdir.name, "missing"))
+        self.assertEqual(list_snapshots(self.snapshots), [])
+
+    def test_publish_and_rollback(self):
+        """
+        Test that publishing switches CURRENT and an older version can be
+        published again.
+        """
+        self.assertEqual(current_index_directory(self.snapshots, self.source), self.source)
+        first = create_snapshot(self.source, self.snapshots)
+        second = create_snapshot(self.source, self.snapshots)
+        self.assertEqual(list_snapshots(self.snapshots), ["v0001", "v0002"])
+
+        publish_snapshot(second, self.snapshots)
+        self.assertEqual(current_index_directory(self.snapshots),
+                         os.path.join(self.snapshots, second))
+        publish_snapshot(first, self.snapshots)
+        self.assertEqual(current_index_directory(self.snapshots),
+                         os.path.join(self.snapshots, first))
+        with self.assertRaises(ValueError):
+            publish_snapshot("v0009", self.snapshots)
+
+    def test_hot_swap_retriever(self):
+        """
+        Test that the retriever switches to a newly published snapshot
+        without being recreated.
+        """
+        built = []
+
+        def factory(directory):
+            built.append(directory)
+            return DirectoryRetriever(directory=directory)
+
+        retriever = HotSwapRetriever(
+            factory=factory, snapshot_root=self.snapshots, default_directory=self.source
+        )
+        self.assertEqual(retriever.invoke("q")[0].page_content, self.source)
+
+        version = create_snapshot(self.source, self.snapshots)
+        publish_snapshot(version, self.snapshots)
+        snapshot_directory = os.path.join(self.snapshots, version)
+        self.assertEqual(retriever.invoke("q")[0].page_content, snapshot_directory)
+        retriever.invoke("q")
+
+        self.assertEqual(built, [self.source, snapshot_directory])
+
+    def test_hot_swap_detects_publishes_within_one_tick(self):
+        """
+        Test that a rollback published within the same pointer mtime is picked
+        up and that the replaced directory's Chroma client is released.
+        """
+        retriever = HotSwapRetriever(
+            factory=lambda directory: DirectoryRetriever(directory=directory),
+            snapshot_root=self.snapshots,
+            default_directory=self.source,
+        )
+        first = create_snapshot(self.source, self.snapshots)
+        second = create_snapshot(self.source, self.snapshots)
+        pointer = os.path.join(self.snapshots, "CURRENT")
+
+        publish_snapshot(first, self.snapshots)
+        open_client(os.path.join(self.snapshots, first))
+        self.assertEqual(retriever.invoke("q")[0].page_content,
+                         os.path.join(self.snapshots, first))
+
+        mtime = os.stat(pointer).st_mtime_ns
+        publish_snapshot(second, self.snapshots)
+        os.utime(pointer, ns=(mtime, mtime))
+        self.assertEqual(retriever.invoke("q")[0].page_content,
+                         os.path.join(self.snapshots, second))
+        systems = SharedSystemClient._identifier_to_system  # pylint: disable=protected-access
+        self.assertNotIn(os.path.join(self.snapshots, first), systems)
+
+
+if __name__ == "__main__":
+    unittest.main()
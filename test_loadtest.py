@@ -0,0 +1,99 @@
+"""
+Unit tests for the load-test harness. These tests run the bot's handlers
+against the fake Telegram Bot API, check the fake LLM server's tool-calling
+and structured-output replies, and validate the report helpers.
+"""
+
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+
+from langchain_core.tools import tool
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, Field
+
+from bot import build_application
+from fake_openai import FakeOpenAIServer
+from fake_telegram import FakeTelegramServer
+from loadtest import BOT_TOKEN, LoadResults, percentile, virtual_user
+
+
+class Grade(BaseModel):
+    """Binary score for relevance check."""
+    binary_score: str = Field(description="Relevance score 'yes' or 'no'")
+
+
+@tool
+def retrieve_documents(query: str) -> str:
+    """Search and return information about the bank."""
+    return query
+
+
+class TestLoadTest(unittest.IsolatedAsyncioTestCase):
+    """
+    Test suite for the fake servers and the loadtest module.
+    """
+    def test_percentile(self):
+        """
+        Test percentiles of an unordered list and of an empty list.
+        """
+        values = [5.0, 1.0, 4.0, 2.0, 3.0]
+        self.assertEqual(percentile(values, 0.5), 3.0)
+        self.assertEqual(percentile(values, 0.99), 5.0)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_virtual_user_records_replies(self):
+        """
+        Test that a virtual user separates successful and error replies and
+        stops on a timeout.
+        """
+        results = LoadResults()
+        with FakeTelegramServer() as server:
+            server.call("sendMessage", {"chat_id": 7, "text": "An unexpected error occurred."})
+            server.call("sendMessage", {"chat_id": 7, "text": "Profit was 10 billion."})
+            virtual_user(server, 7, start_at=0, stop_at=time.monotonic() + 5,
+                         think_time=0, reply_timeout=0.2, results=results)
+
+        self.assertEqual(len(results.latencies), 1)
+        self.assertEqual(results.errors, 1)
+        self.assertEqual(results.timeouts, 1)
+
+    @patch("bot.run_rag_agent", return_value="Profit was 10 billion.")
+    async def test_bot_replies_through_fake_telegram(self, mock_run_rag_agent):
+        """
+        Test that the bot polls the fake Bot API and its reply is recorded.
+        """
+        with FakeTelegramServer() as server:
+            application = build_application(BOT_TOKEN, server.base_url)
+            await application.initialize()
+            await application.start()
+            await application.updater.start_polling(poll_interval=0, timeout=1)
+            try:
+                server.send_user_message(42, "What was the profit?")
+                reply = await asyncio.to_thread(server.wait_for_reply, 42, 10)
+            finally:
+                await application.updater.stop()
+                await application.stop()
+                await application.shutdown()
+
+        mock_run_rag_agent.assert_called_once_with("What was the profit?")
+        self.assertEqual(reply["text"], "Profit was 10 billion.")
+        self.assertEqual(server.method_counts["getMe"], 1)
+
+    def test_fake_llm_tool_call_and_structured_output(self):
+        """
+        Test that the fake LLM calls a bound tool and fills a JSON schema.
+        """
+        with FakeOpenAIServer() as server:
+            model = ChatOpenAI(model="gpt-4o-mini", base_url=server.base_url, api_key="test")
+
+            message = model.bind_tools([retrieve_documents]).invoke("What was the profit?")
+            grade = model.with_structured_output(Grade).invoke("Is it relevant?")
+
+        self.assertEqual(message.tool_calls[0]["name"], "retrieve_documents")
+        self.assertEqual(grade.binary_score, "yes")
+
+
+if __name__ == "__main__":
+    unittest.main()
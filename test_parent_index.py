@@ -0,0 +1,87 @@
+"""
+Unit tests for the parent_index module. These tests build a parent/child index
+in a temporary directory with a deterministic fake embedding model and check
+that child hits are resolved to deduplicated parent documents.
+"""
+
+import tempfile
+import unittest
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from parent_index import MAX_PARENTS, get_parent_retriever
+from test_compressor import KeywordEmbeddings
+
+
+class TestParentIndex(unittest.TestCase):
+    """
+    Test suite for the parent_index module.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.retriever = get_parent_retriever(
+            KeywordEmbeddings(),
+            persist_directory=f"{self.tmpdir.name}/chromadb",
+            docstore_directory=f"{self.tmpdir.name}/docstore",
+            child_splitter=RecursiveCharacterTextSplitter(chunk_size=30, chunk_overlap=0),
+            parent_splitter=RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=0),
+        )
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_children_resolve_to_deduplicated_parents(self):
+        """
+        Test that several children of one page return that page only once,
+        with its full text.
+        """
+        finance_page = (
+            "Profit grew by ten percent this year.\n\n"
+            "Revenue and profit both reached record highs.\n\n"
+            "Margins improved in every segment."
+        )
+        sports_page = (
+            "The football tournament was a success.\n\n"
+            "The weather was cold during the football final."
+        )
+        self.retriever.add_documents([
+            Document(page_content=finance_page, metadata={"source": "report.pdf", "page": 1}),
+            Document(page_content=sports_page, metadata={"source": "report.pdf", "page": 2}),
+        ])
+
+        results = self.retriever.invoke("How did profit change?")
+
+        contents = [doc.page_content for doc in results]
+        self.assertEqual(contents[0], finance_page)
+        self.assertEqual(len(contents), len(set(contents)))
+        self.assertEqual(results[0].metadata["page"], 1)
+
+    def test_number_of_parents_is_capped(self):
+        """
+        Test that no more than MAX_PARENTS parents are returned, even when
+        more parents have matching children.
+        """
+        self.retriever.add_documents([
+            Document(page_content=f"Profit of segment {i} grew.", metadata={"page": i})
+            for i in range(MAX_PARENTS + 2)
+        ])
+
+        results = self.retriever.invoke("profit")
+
+        self.assertEqual(len(results), MAX_PARENTS)
+
+    def test_children_are_searched(self):
+        """
+        Test that the child collection holds small chunks linked to a parent ID.
+        """
+        page = "Employees were trained.\n\nRevenue was stable.\n\nWeather was mild."
+        self.retriever.add_documents([Document(page_content=page, metadata={"page": 1})])
+
+        children = self.retriever.vectorstore.similarity_search("revenue", k=1)
+
+        self.assertEqual(children[0].page_content, "Revenue was stable.")
+        self.assertIn(self.retriever.id_key, children[0].metadata)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,346 @@
+"""
+Unit tests for the resilience module. These tests cover the circuit breaker,
+retries, deadlines, hedging and fallback of ResilientClient, both with plain
+functions and against the fault-injecting fake OpenAI server.
+"""
+
+import threading
+import time
+import unittest
+import openai
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from fake_openai import FakeOpenAIConfig, FakeOpenAIServer
+from resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceededError,
+    LatencyTracker,
+    ResilientClient,
+    ResilientEmbeddings,
+)
+
+RETRY_ON = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+class FakeClock:  # pylint: disable=too-few-public-methods
+    """
+    A manually advanced clock for the circuit breaker.
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fake_model(server: FakeOpenAIServer, timeout: float = 5.0) -> ChatOpenAI:
+    """
+    Creates a ChatOpenAI model pointed at the fake server.
+    """
+    return ChatOpenAI(model="gpt-4o-mini", base_url=server.base_url, api_key="test",
+                      timeout=timeout, max_retries=0)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    Test suite for CircuitBreaker.
+    """
+    def test_opens_after_threshold_and_recovers(self):
+        """
+        Test that the breaker opens after consecutive failures, lets one trial
+        call through after the reset timeout and closes on success.
+        """
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+
+        clock.now = 10
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_failure_reopens(self):
+        """
+        Test that a failed trial call opens the circuit again.
+        """
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+
+class TestLatencyTracker(unittest.TestCase):
+    """
+    Test suite for LatencyTracker.
+    """
+    def test_percentile(self):
+        """
+        Test the percentile of recorded samples.
+        """
+        tracker = LatencyTracker()
+        self.assertIsNone(tracker.percentile(0.95))
+        for i in range(1, 101):
+            tracker.record(i / 100)
+        self.assertEqual(tracker.percentile(0.95), 0.96)
+        self.assertEqual(tracker.percentile(0.5), 0.51)
+
+
+class TestResilientClient(unittest.TestCase):
+    """
+    Test suite for ResilientClient with plain functions.
+    """
+    def test_retries_until_success(self):
+        """
+        Test that failures are retried and the successful result is returned.
+        """
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ConnectionError("boom")
+            return "ok"
+
+        client = ResilientClient(max_retries=2, backoff_base=0.01)
+        self.assertEqual(client.call(flaky, deadline=5), "ok")
+        self.assertEqual(len(calls), 3)
+
+    def test_non_retryable_error_is_raised(self):
+        """
+        Test that errors outside retry_on are raised without retrying.
+        """
+        calls = []
+
+        def bad_request():
+            calls.append(1)
+            raise KeyError("bad")
+
+        client = ResilientClient(max_retries=2, retry_on=(ConnectionError,))
+        with self.assertRaises(KeyError):
+            client.call(bad_request, deadline=5)
+        self.assertEqual(len(calls), 1)
+
+    def test_deadline_exceeded(self):
+        """
+        Test that a slow call is abandoned at the deadline.
+        """
+        client = ResilientClient()
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceededError):
+            client.call(lambda: time.sleep(1), deadline=0.1)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_circuit_open_fails_fast(self):
+        """
+        Test that calls are rejected without being made while the circuit is open.
+        """
+        calls = []
+
+        def failing():
+            calls.append(1)
+            raise ConnectionError("down")
+
+        client = ResilientClient(max_retries=0,
+                                 breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                client.call(failing, deadline=1)
+        with self.assertRaises(CircuitOpenError):
+            client.call(failing, deadline=1)
+        self.assertEqual(len(calls), 2)
+
+    def test_non_upstream_error_settles_half_open_trial(self):
+        """
+        Test that a half-open trial call failing with a non-upstream error
+        (e.g. a bad request) closes the circuit instead of leaving it stuck.
+        """
+        clock = FakeClock()
+        client = ResilientClient(
+            max_retries=0,
+            breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock),
+            retry_on=(ConnectionError,),
+        )
+
+        def fail_upstream():
+            raise ConnectionError("down")
+
+        def bad_request():
+            raise ValueError("bad request")
+
+        with self.assertRaises(ConnectionError):
+            client.call(fail_upstream, deadline=5)
+        clock.now = 10
+        with self.assertRaises(ValueError):
+            client.call(bad_request, deadline=5)
+
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(client.call(lambda: "ok", deadline=5), "ok")
+
+    def test_hedged_request_wins(self):
+        """
+        Test that a duplicate request is sent after the hedge delay and the
+        faster response is returned.
+        """
+        lock = threading.Lock()
+        calls = []
+
+        def slow_first():
+            with lock:
+                calls.append(1)
+                first = len(calls) == 1
+            time.sleep(1.0 if first else 0.01)
+            return "first" if first else "hedged"
+
+        client = ResilientClient(hedge=True, hedge_min_delay=0.05)
+        started = time.monotonic()
+        self.assertEqual(client.call(slow_first, deadline=5), "hedged")
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(len(calls), 2)
+
+    def test_hedge_delay_uses_percentile(self):
+        """
+        Test that the hedge delay switches to the observed quantile once
+        enough samples are recorded.
+        """
+        client = ResilientClient(hedge_min_delay=2.0, hedge_min_samples=10)
+        self.assertEqual(client.hedge_delay("generate"), 2.0)
+        for _ in range(10):
+            client.latencies("generate").record(0.3)
+        self.assertEqual(client.hedge_delay("generate"), 0.3)
+
+    def test_latencies_are_tracked_per_node(self):
+        """
+        Test that slow calls of one node do not change another node's
+        hedge delay.
+        """
+        client = ResilientClient(hedge_min_samples=3)
+        for _ in range(3):
+            client.call(lambda: time.sleep(0.05), deadline=5, name="generate")
+            client.call(lambda: None, deadline=5, name="rewrite")
+        self.assertGreaterEqual(client.hedge_delay("generate"), 0.05)
+        self.assertLess(client.hedge_delay("rewrite"), 0.05)
+
+
+class TestResilientClientWithFakeServer(unittest.TestCase):
+    """
+    Test suite for ResilientClient against the fault-injecting fake server.
+    """
+    def test_success(self):
+        """
+        Test a normal call through the fake server.
+        """
+        with FakeOpenAIServer(FakeOpenAIConfig(reply="pong")) as server:
+            client = ResilientClient(retry_on=RETRY_ON)
+            result = client.invoke("agent", fake_model(server), "ping")
+        self.assertEqual(result.content, "pong")
+
+    def test_fallback_on_server_errors(self):
+        """
+        Test that server errors are retried and then answered by the fallback.
+        """
+        with FakeOpenAIServer(FakeOpenAIConfig(error_rate=1.0)) as primary, \
+                FakeOpenAIServer(FakeOpenAIConfig(reply="fallback")) as secondary:
+            client = ResilientClient(max_retries=2, backoff_base=0.01, retry_on=RETRY_ON)
+            result = client.invoke("agent", fake_model(primary), "ping", fake_model(secondary))
+            primary_calls = primary.request_counts["/v1/chat/completions"]
+        self.assertEqual(result.content, "fallback")
+        self.assertEqual(primary_calls, 3)
+
+    def test_fallback_on_hanging_server(self):
+        """
+        Test that a hanging primary is abandoned before the deadline and the
+        fallback answers within the same deadline.
+        """
+        with FakeOpenAIServer(FakeOpenAIConfig(hang_rate=1.0, hang_seconds=3)) as primary, \
+                FakeOpenAIServer(FakeOpenAIConfig(reply="fallback")) as secondary:
+            client = ResilientClient(deadlines={"generate": 1.0}, fallback_reserve=0.5,
+                                     retry_on=RETRY_ON)
+            started = time.monotonic()
+            result = client.invoke(
+                "generate", fake_model(primary, 1.0), "ping", fake_model(secondary, 1.0)
+            )
+            elapsed = time.monotonic() - started
+        self.assertEqual(result.content, "fallback")
+        self.assertLess(elapsed, 1.0)
+
+    def test_outage_of_both_models_fails_fast(self):
+        """
+        Test that the primary and the fallback together stay within the node's
+        deadline, and that once both circuits are open calls fail at once.
+        """
+        hanging = FakeOpenAIConfig(hang_rate=1.0, hang_seconds=3)
+        with FakeOpenAIServer(hanging) as primary, FakeOpenAIServer(hanging) as secondary:
+            client = ResilientClient(
+                deadlines={"generate": 0.6},
+                max_retries=0,
+                breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60),
+                fallback_breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60),
+                retry_on=RETRY_ON,
+            )
+            model, fallback = fake_model(primary, 1.0), fake_model(secondary, 1.0)
+            started = time.monotonic()
+            with self.assertRaises(DeadlineExceededError):
+                client.invoke("generate", model, "ping", fallback)
+            first_elapsed = time.monotonic() - started
+
+            started = time.monotonic()
+            with self.assertRaises(CircuitOpenError):
+                client.invoke("generate", model, "ping", fallback)
+            second_elapsed = time.monotonic() - started
+            requests = (primary.request_counts.get("/v1/chat/completions", 0)
+                        + secondary.request_counts.get("/v1/chat/completions", 0))
+
+        self.assertLess(first_elapsed, 0.8)
+        self.assertLess(second_elapsed, 0.3)
+        self.assertEqual(requests, 2)
+
+    def test_circuit_breaker_skips_failing_upstream(self):
+        """
+        Test that once the circuit opens, requests go straight to the fallback.
+        """
+        with FakeOpenAIServer(FakeOpenAIConfig(error_rate=1.0)) as primary, \
+                FakeOpenAIServer(FakeOpenAIConfig(reply="fallback")) as secondary:
+            client = ResilientClient(
+                max_retries=0,
+                breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60),
+                retry_on=RETRY_ON,
+            )
+            for _ in range(5):
+                result = client.invoke("agent", fake_model(primary), "ping", fake_model(secondary))
+                self.assertEqual(result.content, "fallback")
+            primary_calls = primary.request_counts["/v1/chat/completions"]
+        self.assertEqual(primary_calls, 2)
+
+    def test_embeddings_are_retried_and_share_the_breaker(self):
+        """
+        Test that embedding calls are retried and counted by the breaker.
+        """
+        with FakeOpenAIServer(FakeOpenAIConfig(error_rate=1.0)) as server:
+            breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+            client = ResilientClient(max_retries=1, backoff_base=0.01, breaker=breaker,
+                                     retry_on=RETRY_ON)
+            embeddings = ResilientEmbeddings(
+                OpenAIEmbeddings(base_url=server.base_url, api_key="test", max_retries=0,
+                                 check_embedding_ctx_length=False),
+                client,
+            )
+            with self.assertRaises(openai.InternalServerError):
+                embeddings.embed_query("ping")
+            with self.assertRaises(CircuitOpenError):
+                embeddings.embed_documents(["ping"])
+            embedding_calls = server.request_counts["/v1/embeddings"]
+        self.assertEqual(embedding_calls, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
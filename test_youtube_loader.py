@@ -0,0 +1,239 @@
+"""
+Unit tests for the youtube_loader module. These tests run against a local fake
+transcript source and check URL resolution, concurrent fetching under limits,
+the on-disk transcript cache and timestamp-preserving splitting.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from youtube_loader import (
+    DirectoryTranscriptSource,
+    TranscriptCache,
+    fetch_playlist_video_ids,
+    fetch_transcripts,
+    load_youtube_documents,
+    resolve_video_ids,
+    split_transcript,
+)
+
+
+def make_segments(count: int, words: int = 5) -> list:
+    """
+    Creates transcript segments of `words` words, 10 seconds apart.
+    """
+    return [
+        {"text": " ".join([f"s{i}"] * words), "start": i * 10.0, "duration": 10.0}
+        for i in range(count)
+    ]
+
+
+def word_count(text: str) -> int:
+    """
+    Counts whitespace-separated words; a stand-in for the token counter.
+    """
+    return len(text.split())
+
+
+class CountingSource:  # pylint: disable=too-few-public-methods
+    """
+    A fake transcript source that records fetches and their concurrency.
+    """
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.fetched = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, video_id):
+        """Returns two segments for the video after a short delay."""
+        with self._lock:
+            self.fetched.append(video_id)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if video_id == "broken":
+            raise ValueError("Transcripts are disabled")
+        return make_segments(2)
+
+
+class FakeResponse:  # pylint: disable=too-few-public-methods
+    """
+    A minimal requests.Response stand-in.
+    """
+    def __init__(self, text: str):
+        self.text = text
+
+    def raise_for_status(self):
+        """Never fails."""
+
+
+class FakePlaylistSession:
+    """
+    A fake HTTP session serving a playlist page and its continuation pages.
+    """
+    def __init__(self, page: str, continuations: list):
+        self.page = page
+        self.continuations = list(continuations)
+        self.posted = []
+
+    def get(self, url, timeout):  # pylint: disable=unused-argument
+        """Returns the playlist page."""
+        return FakeResponse(self.page)
+
+    def post(self, url, params, json, timeout):  # pylint: disable=unused-argument,redefined-outer-name
+        """Returns the next continuation page."""
+        self.posted.append((params, json))
+        return FakeResponse(self.continuations.pop(0))
+
+
+class TestYouTubeLoader(unittest.TestCase):
+    """
+    Test suite for the youtube_loader module.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.cache = TranscriptCache(os.path.join(self.tmpdir.name, "cache"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_resolve_video_ids(self):
+        """
+        Test that videos, playlists and duplicates are resolved in order.
+        """
+        urls = [
+            "https://youtu.be/aaaaaaaaaaa?si=x",
+            "https://www.youtube.com/playlist?list=PL123",
+            "https://www.youtube.com/watch?v=ccccccccccc&list=PL123",
+        ]
+        ids = resolve_video_ids(urls, playlist_fetcher=lambda _: ["bbbbbbbbbbb", "aaaaaaaaaaa"])
+        self.assertEqual(ids, ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"])
+
+    def test_playlist_follows_continuation_pages(self):
+        """
+        Test that videos beyond the first playlist page are fetched with the
+        continuation token.
+        """
+        page = (
+            '"INNERTUBE_API_KEY":"key1","INNERTUBE_CLIENT_VERSION":"2.1",'
+            '"videoId":"aaaaaaaaaaa","videoId":"bbbbbbbbbbb",'
+            '"continuationCommand":{"token":"page2"}'
+        )
+        continuation = '{"videoId": "ccccccccccc", "videoId": "bbbbbbbbbbb"}'
+        session = FakePlaylistSession(page, [continuation])
+
+        ids = fetch_playlist_video_ids("PL123", session=session)
+
+        self.assertEqual(ids, ["aaaaaaaaaaa", "bbbbbbbbbbb", "ccccccccccc"])
+        params, body = session.posted[0]
+        self.assertEqual(params, {"key": "key1"})
+        self.assertEqual(body["continuation"], "page2")
+
+    def test_playlist_warns_when_empty_or_truncated(self):
+        """
+        Test that an empty result and a page limit are reported.
+        """
+        with patch("builtins.print") as mock_print:
+            self.assertEqual(fetch_playlist_video_ids(
+                "PL123", session=FakePlaylistSession("<html>consent</html>", [])
+            ), [])
+        self.assertIn("no videos found", mock_print.call_args[0][0])
+
+        page = '"INNERTUBE_API_KEY":"k","videoId":"aaaaaaaaaaa","continuationCommand":{"token":"t"}'
+        with patch("builtins.print") as mock_print:
+            ids = fetch_playlist_video_ids(
+                "PL123", session=FakePlaylistSession(page, []), max_pages=1
+            )
+        self.assertEqual(ids, ["aaaaaaaaaaa"])
+        self.assertIn("may be truncated", mock_print.call_args[0][0])
+
+    def test_fetch_respects_concurrency_and_skips_failures(self):
+        """
+        Test that no more than `concurrency` fetches run at once and that a
+        failing video is skipped without aborting the run.
+        """
+        source = CountingSource()
+        video_ids = [f"v{i}" for i in range(8)] + ["broken"]
+
+        transcripts = asyncio.run(
+            fetch_transcripts(video_ids, source, self.cache, concurrency=3, rate=0)
+        )
+
+        self.assertEqual(sorted(transcripts), sorted(video_ids[:-1]))
+        self.assertLessEqual(source.max_active, 3)
+        self.assertGreater(source.max_active, 1)
+
+    def test_rate_limit(self):
+        """
+        Test that fetch starts are spaced out by the rate limit.
+        """
+        source = CountingSource(delay=0)
+        started = time.monotonic()
+        asyncio.run(fetch_transcripts(["a", "b", "c"], source, self.cache, concurrency=3, rate=20))
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_cache_prevents_refetch(self):
+        """
+        Test that a second run reads transcripts from the cache.
+        """
+        source = CountingSource(delay=0)
+        asyncio.run(fetch_transcripts(["a", "b"], source, self.cache, rate=0))
+        transcripts = asyncio.run(fetch_transcripts(["a", "b", "c"], source, self.cache, rate=0))
+
+        self.assertEqual(source.fetched.count("a"), 1)
+        self.assertEqual(source.fetched.count("c"), 1)
+        self.assertEqual(transcripts["a"], make_segments(2))
+
+    def test_split_transcript_keeps_timestamps(self):
+        """
+        Test that chunks respect the size, overlap by whole segments and carry
+        their start time and deep link.
+        """
+        docs = split_transcript(
+            make_segments(10), "vid", chunk_size=20, chunk_overlap=5, length_function=word_count
+        )
+
+        self.assertEqual(len(docs), 3)
+        self.assertEqual([doc.metadata["start"] for doc in docs], [0.0, 30.0, 60.0])
+        self.assertEqual(docs[1].metadata["source"], "https://www.youtube.com/watch?v=vid&t=30s")
+        self.assertEqual(docs[0].metadata["end"], 40.0)
+        self.assertTrue(docs[1].page_content.startswith("s3 "))
+        for doc in docs:
+            self.assertLessEqual(word_count(doc.page_content), 20)
+
+    def test_load_from_directory_source(self):
+        """
+        Test a full load from a local directory of transcripts.
+        """
+        source_dir = os.path.join(self.tmpdir.name, "source")
+        os.makedirs(source_dir)
+        with open(os.path.join(source_dir, "xxxxxxxxxxx.json"), "w", encoding="utf-8") as f:
+            json.dump([{"text": "Hello world", "start": 12.5, "duration": 2.0}], f)
+
+        with patch("builtins.print"):
+            docs = load_youtube_documents(
+                ["https://www.youtube.com/watch?v=xxxxxxxxxxx", "https://youtu.be/missingvid1"],
+                source=DirectoryTranscriptSource(source_dir),
+                cache_directory=self.cache.directory,
+                rate=0,
+                length_function=word_count,
+            )
+
+        self.assertEqual(len(docs), 1)
+        self.assertEqual(docs[0].page_content, "Hello world")
+        self.assertEqual(docs[0].metadata["start"], 12.5)
+        self.assertIsNotNone(self.cache.get("xxxxxxxxxxx"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,423 @@
+"""
+This module loads YouTube transcripts for ingestion. It accepts single videos,
+playlists and lists of URLs, fetches transcripts concurrently under a rate
+limit, caches the raw transcripts on disk so re-runs don't refetch them, and
+splits them into chunks that keep their timestamps. Each chunk's `source` is
+a deep link to the moment in the video where the chunk starts.
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from langchain.docstore.document import Document
+from youtube_transcript_api import YouTubeTranscriptApi
+
+from compressor import count_tokens, get_encoding
+
+TRANSCRIPT_CACHE_DIRECTORY = "./transcripts"
+WATCH_URL = "https://www.youtube.com/watch?v={video_id}"
+PLAYLIST_URL = "https://www.youtube.com/playlist?list={playlist_id}"
+# The playlist page lists ~100 videos; the rest come from the browse API
+BROWSE_URL = "https://www.youtube.com/youtubei/v1/browse"
+PLAYLIST_VIDEO_ID_RE = re.compile(r'"videoId":\s*"([\w-]{11})"')
+CONTINUATION_TOKEN_RE = re.compile(r'"continuationCommand":\s*\{\s*"token":\s*"([^"]+)"')
+INNERTUBE_API_KEY_RE = re.compile(r'"INNERTUBE_API_KEY":\s*"([^"]+)"')
+INNERTUBE_CLIENT_VERSION_RE = re.compile(r'"INNERTUBE_CLIENT_VERSION":\s*"([^"]+)"')
+PLAYLIST_MAX_PAGES = 100
+
+
+###############################################################################
+# 1. URL parsing
+###############################################################################
+def is_youtube_link(url: str) -> bool:
+    """
+    Checks if the given URL is a YouTube link.
+
+    Args:
+        url (str): The URL to check.
+
+    Returns:
+        bool: True if the URL is a YouTube link, False otherwise.
+    """
+    return "youtube.com" in url.lower() or "youtu.be" in url.lower()
+
+
+def extract_video_id(url: str) -> str:
+    """
+    Extracts a YouTube video ID from a typical YouTube/YouTu.be link.
+    """
+    if "youtu.be/" in url:
+        # Format like: https://youtu.be/<VIDEO_ID>?...
+        return url.split("youtu.be/")[-1].split("?")[0]
+    if "v=" in url:
+        # Format like: https://www.youtube.com/watch?v=<VIDEO_ID>&...
+        return url.split("v=")[-1].split("&")[0]
+    raise ValueError(f"Could not parse video ID from url: {url}")
+
+
+def extract_playlist_id(url: str) -> Optional[str]:
+    """
+    Extracts the playlist ID ('list' parameter) from a YouTube link, if any.
+    """
+    values = parse_qs(urlparse(url).query).get("list")
+    return values[0] if values else None
+
+
+def deep_link(video_id: str, start: float) -> str:
+    """
+    Returns a link that opens the video at the given second.
+    """
+    return f"{WATCH_URL.format(video_id=video_id)}&t={int(start)}s"
+
+
+def _search(pattern: re.Pattern, text: str) -> Optional[str]:
+    match = pattern.search(text)
+    return match.group(1) if match else None
+
+
+def fetch_playlist_video_ids(
+    playlist_id: str, session=None, max_pages: int = PLAYLIST_MAX_PAGES
+) -> List[str]:
+    """
+    Returns the IDs of the videos in a public playlist, in playlist order.
+
+    The playlist page holds the first ~100 videos; the following pages are
+    requested from YouTube's browse API with the page's continuation token.
+    A warning is printed if the list may be incomplete or nothing was found
+    (e.g. YouTube served a consent page or changed its page layout).
+
+    Args:
+        playlist_id (str): The playlist ID ('list' URL parameter).
+        session (requests.Session, optional): HTTP session to use.
+        max_pages (int): Maximum number of pages to request.
+
+    Returns:
+        List[str]: The video IDs.
+    """
+    session = session or requests.Session()
+    response = session.get(PLAYLIST_URL.format(playlist_id=playlist_id), timeout=10)
+    response.raise_for_status()
+    page = response.text
+    video_ids = dict.fromkeys(PLAYLIST_VIDEO_ID_RE.findall(page))
+    api_key = _search(INNERTUBE_API_KEY_RE, page)
+    client_version = _search(INNERTUBE_CLIENT_VERSION_RE, page) or "2.20240101.00.00"
+    token = _search(CONTINUATION_TOKEN_RE, page)
+
+    pages = 1
+    while token:
+        if not api_key or pages >= max_pages:
+            print(f"Warning: playlist {playlist_id} may be truncated: "
+                  f"only {len(video_ids)} videos were read.")
+            break
+        try:
+            response = session.post(
+                BROWSE_URL,
+                params={"key": api_key},
+                json={
+                    "context": {"client": {"clientName": "WEB", "clientVersion": client_version}},
+                    "continuation": token,
+                },
+                timeout=10,
+            )
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"Warning: playlist {playlist_id} may be truncated at "
+                  f"{len(video_ids)} videos: {e}")
+            break
+        video_ids.update(dict.fromkeys(PLAYLIST_VIDEO_ID_RE.findall(response.text)))
+        next_token = _search(CONTINUATION_TOKEN_RE, response.text)
+        token = next_token if next_token != token else None
+        pages += 1
+
+    if not video_ids:
+        print(f"Warning: no videos found in playlist {playlist_id}; it may be private, "
+              f"or YouTube served a consent page or changed its page layout.")
+    return list(video_ids)
+
+
+def resolve_video_ids(
+    urls: Iterable[str],
+    playlist_fetcher: Callable[[str], List[str]] = fetch_playlist_video_ids,
+) -> List[str]:
+    """
+    Turns video and playlist URLs into a deduplicated list of video IDs.
+    A link to a playlist page expands to all its videos; a link to a video
+    that is played within a playlist is treated as that single video.
+    """
+    video_ids = []
+    for url in urls:
+        playlist_id = extract_playlist_id(url)
+        if playlist_id and "v=" not in url:
+            video_ids.extend(playlist_fetcher(playlist_id))
+        else:
+            video_ids.append(extract_video_id(url))
+    return list(dict.fromkeys(video_ids))
+
+
+def read_url_list(path: str) -> List[str]:
+    """
+    Reads URLs from a text file, one per line. Blank lines and lines
+    starting with '#' are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+###############################################################################
+# 2. Transcript sources + cache
+###############################################################################
+class YouTubeTranscriptSource:  # pylint: disable=too-few-public-methods
+    """
+    Fetches transcripts from YouTube with youtube-transcript-api.
+    """
+    def __init__(self, languages: Iterable[str] = ("en", "ru")):
+        self.languages = list(languages)
+        self._api = YouTubeTranscriptApi()
+
+    def fetch(self, video_id: str) -> List[dict]:
+        """
+        Returns the transcript as a list of {'text', 'start', 'duration'} segments.
+        """
+        return self._api.fetch(video_id, languages=self.languages).to_raw_data()
+
+
+class DirectoryTranscriptSource:  # pylint: disable=too-few-public-methods
+    """
+    Reads transcripts from `<directory>/<video_id>.json` files in the
+    segment format above. A local stand-in for YouTube in tests and
+    offline runs.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def fetch(self, video_id: str) -> List[dict]:
+        """
+        Returns the transcript segments stored for the video.
+        """
+        path = os.path.join(self.directory, f"{video_id}.json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError as e:
+            raise ValueError(f"No transcript for video {video_id}") from e
+
+
+class TranscriptCache:
+    """
+    An on-disk cache of raw transcripts, one JSON file per video.
+    """
+    def __init__(self, directory: str = TRANSCRIPT_CACHE_DIRECTORY):
+        self.directory = directory
+
+    def _path(self, video_id: str) -> str:
+        return os.path.join(self.directory, f"{video_id}.json")
+
+    def get(self, video_id: str) -> Optional[List[dict]]:
+        """
+        Returns the cached segments of the video, or None on a cache miss.
+        """
+        try:
+            with open(self._path(video_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, video_id: str, segments: List[dict]):
+        """
+        Stores the segments of the video. The file is written atomically, so
+        an interrupted run never leaves a truncated transcript behind.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(video_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(segments, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+###############################################################################
+# 3. Concurrent fetching
+###############################################################################
+class RateLimiter:  # pylint: disable=too-few-public-methods
+    """
+    Spaces out request starts to at most `rate` per second.
+    """
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        """
+        Waits until the next request may start.
+        """
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def fetch_transcripts(
+    video_ids: List[str],
+    source,
+    cache: TranscriptCache,
+    concurrency: int = 4,
+    rate: float = 2.0,
+) -> Dict[str, List[dict]]:
+    """
+    Fetches the transcripts of the videos concurrently, using the cache.
+
+    At most `concurrency` fetches run at once and at most `rate` start per
+    second. Videos whose transcript can't be fetched are reported and skipped.
+
+    Args:
+        video_ids (List[str]): The videos to fetch.
+        source: Object with a `fetch(video_id)` method returning segments.
+        cache (TranscriptCache): Cache of raw transcripts.
+        concurrency (int): Maximum number of concurrent fetches.
+        rate (float): Maximum number of fetches started per second.
+
+    Returns:
+        Dict[str, List[dict]]: Segments by video ID for the fetched videos.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(rate)
+
+    async def fetch_one(video_id: str):
+        segments = cache.get(video_id)
+        if segments is not None:
+            return segments
+        async with semaphore:
+            await limiter.wait()
+            try:
+                segments = await asyncio.to_thread(source.fetch, video_id)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                print(f"Failed to get YouTube transcript for {video_id}: {e}")
+                return None
+        cache.put(video_id, segments)
+        return segments
+
+    results = await asyncio.gather(*(fetch_one(video_id) for video_id in video_ids))
+    return {
+        video_id: segments
+        for video_id, segments in zip(video_ids, results)
+        if segments is not None
+    }
+
+
+###############################################################################
+# 4. Timestamp-preserving splitting
+###############################################################################
+def split_transcript(
+    segments: List[dict],
+    video_id: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    length_function: Optional[Callable[[str], int]] = None,
+) -> List[Document]:
+    """
+    Groups transcript segments into chunks of up to `chunk_size` tokens,
+    repeating the last `chunk_overlap` tokens' worth of segments in the next
+    chunk. Segments are never cut, so every chunk starts at a known time.
+
+    Args:
+        segments (List[dict]): {'text', 'start', 'duration'} segments.
+        video_id (str): The video the segments belong to.
+        chunk_size (int): Maximum chunk length in tokens.
+        chunk_overlap (int): Overlap between consecutive chunks in tokens.
+        length_function (Callable, optional): Token counter for a text.
+
+    Returns:
+        List[Document]: Chunks with 'source' (deep link), 'video_id',
+        'start' and 'end' metadata.
+    """
+    if length_function is None:
+        length_function = partial(count_tokens, encoding=get_encoding())
+
+    def make_document(group):
+        first, last = group[0][0], group[-1][0]
+        start = float(first["start"])
+        return Document(
+            page_content=" ".join(segment["text"].strip() for segment, _ in group),
+            metadata={
+                "source": deep_link(video_id, start),
+                "video_id": video_id,
+                "start": start,
+                "end": float(last["start"]) + float(last.get("duration", 0)),
+            },
+        )
+
+    documents = []
+    current, current_len = [], 0
+    for segment in segments:
+        text = segment["text"].strip()
+        if not text:
+            continue
+        length = length_function(text)
+        if current and current_len + length > chunk_size:
+            documents.append(make_document(current))
+            # Carry over trailing segments as the overlap
+            overlap, overlap_len = [], 0
+            for item in reversed(current):
+                if overlap_len + item[1] > chunk_overlap:
+                    break
+                overlap.insert(0, item)
+                overlap_len += item[1]
+            current, current_len = overlap, overlap_len
+        current.append((segment, length))
+        current_len += length
+    if current:
+        documents.append(make_document(current))
+    return documents
+
+
+def load_youtube_documents(  # pylint: disable=too-many-arguments
+    urls: Iterable[str],
+    *,
+    source=None,
+    cache_directory: str = TRANSCRIPT_CACHE_DIRECTORY,
+    concurrency: int = 4,
+    rate: float = 2.0,
+    length_function: Optional[Callable[[str], int]] = None,
+) -> List[Document]:
+    """
+    Loads and splits the transcripts of the given video/playlist URLs.
+
+    Args:
+        urls (Iterable[str]): Video or playlist URLs.
+        source: Transcript source; YouTube by default.
+        cache_directory (str): Directory of the raw transcript cache.
+        concurrency (int): Maximum number of concurrent fetches.
+        rate (float): Maximum number of fetches started per second.
+        length_function (Callable, optional): Token counter for splitting.
+
+    Returns:
+        List[Document]: Timestamped chunks of all fetched videos.
+    """
+    video_ids = resolve_video_ids(urls)
+    transcripts = asyncio.run(fetch_transcripts(
+        video_ids,
+        source or YouTubeTranscriptSource(),
+        TranscriptCache(cache_directory),
+        concurrency=concurrency,
+        rate=rate,
+    ))
+    print(f"Fetched transcripts for {len(transcripts)} of {len(video_ids)} videos.")
+
+    documents = []
+    for video_id in video_ids:
+        if video_id in transcripts:
+            documents.extend(split_transcript(
+                transcripts[video_id], video_id, length_function=length_function
+            ))
+    return documents